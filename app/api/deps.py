@@ -1,11 +1,11 @@
 from fastapi import Depends, HTTPException, status
-from ..models.user import User
+from ..core.security import Principal
 from .v1.auth import get_current_user
 
 
-def get_current_active_user(
-    current_user: User = Depends(get_current_user),
-) -> User:
+async def get_current_active_user(
+    current_user: Principal = Depends(get_current_user),
+) -> Principal:
     if not current_user.is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user"
@@ -13,9 +13,9 @@ def get_current_active_user(
     return current_user
 
 
-def get_current_admin_user(
-    current_user: User = Depends(get_current_active_user),
-) -> User:
+async def get_current_admin_user(
+    current_user: Principal = Depends(get_current_active_user),
+) -> Principal:
     if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
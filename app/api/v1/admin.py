@@ -1,108 +1,384 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ...database import get_db
-from ...models.user import User as UserModel
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    File,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.exc import StaleDataError
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import csv
+import io
+import itertools
+from ...core.config import settings
+from ...core.etag import collection_etag, etag_matches, not_modified
+from ...core.integrity import (
+    FOREIGN_KEY_VIOLATION,
+    UNIQUE_VIOLATION,
+    constraint_violation,
+)
+from ...core.metrics import collect
+from ...core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from ...core.request_metrics import query_budget
+from ...core.responses import rows_response, schema_columns
+from ...database import get_db, get_session_factory
 from ...models.member import Member as MemberModel
-from ...schema.member import Member, MemberCreate, MemberUpdate
+from ...models.user import User as UserModel
+from ...schema.member import (
+    Member,
+    MemberCreate,
+    MemberImportResult,
+    MemberSearchResult,
+    MemberUpdate,
+    MemberWithUser,
+)
+from ...services.collection_versions import MEMBERS, USERS, collection_versions
+from ...services.member_export import MEDIA_TYPES, stream_members
+from ...services.member_import import import_members
+from ...services.member_search import (
+    MemberSearch,
+    member_search_query,
+    next_search_cursor,
+)
+from ...services.membership_events import CREATED, UPDATED, record_event
+from ...services.membership_stats import MemberState, membership_stats
+from ...core.security import Principal, get_read_db
 from ..deps import get_current_admin_user
 
 router = APIRouter()
 
 
 @router.post("/members", response_model=Member, status_code=status.HTTP_201_CREATED)
-def create_member(
+@query_budget(4)
+async def create_member(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     member_in: MemberCreate,
-    _: UserModel = Depends(get_current_admin_user)
+    _: Principal = Depends(get_current_admin_user)
 ):
-    user = db.query(UserModel).filter(UserModel.id == member_in.user_id).first()
-    if not user:
+    db_member = MemberModel(**member_in.model_dump())
+    db.add(db_member)
+    record_event(db, db_member, CREATED, details="Membership created")
+    try:
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        violation = constraint_violation(exc)
+        if violation == FOREIGN_KEY_VIOLATION:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+            )
+        if violation == UNIQUE_VIOLATION:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Member already exists for this user",
+            )
+        raise
+    if not db.get_bind().dialect.insert_returning:
+        # server defaults were not returned by the INSERT (MySQL)
+        await db.refresh(db_member)
+    membership_stats.record_added(
+        MemberState.of(db_member), db_member.created_at.date()
+    )
+    return db_member
+
+
+def _check_import_size(rows: list) -> None:
+    if len(rows) > settings.MEMBER_IMPORT_MAX_ROWS:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.MEMBER_IMPORT_MAX_ROWS} rows per import",
         )
 
-    existing_member = (
-        db.query(MemberModel).filter(MemberModel.user_id == member_in.user_id).first()
-    )
-    if existing_member:
+
+@router.post("/members/bulk", response_model=MemberImportResult)
+@query_budget(max_repeats=0)
+async def bulk_import_members(
+    *,
+    db: AsyncSession = Depends(get_db),
+    rows: List[Dict[str, Any]] = Body(...),
+    upsert: bool = False,
+    _: Principal = Depends(get_current_admin_user)
+):
+    _check_import_size(rows)
+    return await import_members(db, rows, upsert=upsert)
+
+
+@router.post("/members/bulk/csv", response_model=MemberImportResult)
+@query_budget(max_repeats=0)
+async def bulk_import_members_csv(
+    *,
+    db: AsyncSession = Depends(get_db),
+    file: UploadFile = File(...),
+    upsert: bool = False,
+    _: Principal = Depends(get_current_admin_user)
+):
+    # header: user_id,membership_status,membership_start,membership_end
+    reader = csv.DictReader(io.TextIOWrapper(file.file, encoding="utf-8-sig"))
+    try:
+        rows = list(itertools.islice(reader, settings.MEMBER_IMPORT_MAX_ROWS + 1))
+    except (UnicodeDecodeError, csv.Error):
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Member already exists for this user",
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid CSV file"
         )
-
-    db_member = MemberModel(**member_in.model_dump())
-    db.add(db_member)
-    db.commit()
-    db.refresh(db_member)
-    return db_member
+    _check_import_size(rows)
+    return await import_members(db, rows, upsert=upsert)
 
 
 @router.put("/members/{member_id}", response_model=Member)
-def update_member(
+@query_budget(5)
+async def update_member(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     member_id: int,
     member_in: MemberUpdate,
-    _: UserModel = Depends(get_current_admin_user)
+    _: Principal = Depends(get_current_admin_user)
 ):
 
-    member = db.query(MemberModel).filter(MemberModel.id == member_id).first()
+    member = await db.get(MemberModel, member_id)
     if not member:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Member not found"
         )
 
+    before = MemberState.of(member)
     for field, value in member_in.model_dump(exclude_unset=True).items():
         setattr(member, field, value)
+    record_event(db, member, UPDATED, details="Membership updated by admin")
 
-    db.commit()
-    db.refresh(member)
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Member was modified concurrently, retry",
+        )
+    await db.refresh(member)
+    membership_stats.record_changed(before, MemberState.of(member))
     return member
 
 
 @router.delete("/members/{member_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_member(
+@query_budget(3)
+async def delete_member(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     member_id: int,
-    _: UserModel = Depends(get_current_admin_user)
+    _: Principal = Depends(get_current_admin_user)
 ):
-    member = db.query(MemberModel).filter(MemberModel.id == member_id).first()
+    member = await db.get(MemberModel, member_id)
     if not member:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Member not found"
         )
 
-    db.delete(member)
-    db.commit()
+    await db.delete(member)
+    await db.commit()
+    membership_stats.record_deleted(MemberState.of(member), member.created_at.date())
     return None
 
 
-@router.get("/members", response_model=List[Member])
-def get_all_members(
-    db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
-    _: UserModel = Depends(get_current_admin_user),
+def members_page_query(limit: int, skip: int = 0, cursor: Optional[str] = None):
+    # keyset on id; skip is only honoured when no cursor is given
+    query = select(MemberModel).order_by(MemberModel.id).limit(limit + 1)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, ["id"])
+        return query.where(MemberModel.id > last_id)
+    return query.offset(skip)
+
+
+def membership_records_query(
+    limit: int, skip: int = 0, cursor: Optional[str] = None
 ):
-    members = db.query(MemberModel).offset(skip).limit(limit).all()
+    # keyset on (membership_end, id), served by ix_members_status_end
+    query = (
+        select(MemberModel)
+        .where(MemberModel.membership_status == True)
+        .order_by(MemberModel.membership_end, MemberModel.id)
+        .limit(limit + 1)
+    )
+    if cursor:
+        last_end, last_id = decode_cursor(cursor, ["end", "id"], datetimes=["end"])
+        return query.where(
+            tuple_(MemberModel.membership_end, MemberModel.id) > (last_end, last_id)
+        )
+    return query.offset(skip)
+
+
+# the fast path selects exactly the response schema's fields as plain rows
+MEMBER_COLUMNS = schema_columns(Member, MemberModel)
+members_with_user = TypeAdapter(List[MemberWithUser])
+
+# ?include=user on the listings
+INCLUDE_PATTERN = "^user$"
+
+
+async def fetch_member_page(db: AsyncSession, query, include_user: bool = False):
+    if include_user:
+        # users come from the same SELECT (many-to-one inner join), so the
+        # page is one query however many rows it has
+        query = query.options(joinedload(MemberModel.user, innerjoin=True))
+        return (await db.scalars(query)).all()
+    if settings.FAST_JSON_RESPONSES:
+        return (await db.execute(query.with_only_columns(*MEMBER_COLUMNS))).all()
+    return (await db.scalars(query)).all()
+
+
+def member_page_response(members: list, response: Response, include_user=False):
+    if include_user:
+        # the route's response_model only knows the flat Member shape
+        content = members_with_user.dump_python(
+            members_with_user.validate_python(members, from_attributes=True),
+            mode="json",
+        )
+        return JSONResponse(content, headers=dict(response.headers))
+    if settings.FAST_JSON_RESPONSES:
+        return rows_response(members, headers=dict(response.headers))
     return members
 
 
+def listing_collections(include_user: bool = False) -> tuple:
+    # expanded rows also change when a user does
+    return (MEMBERS, USERS) if include_user else (MEMBERS,)
+
+
+@router.get("/members", response_model=List[Member])
+@query_budget(2)
+async def get_all_members(
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include: Optional[str] = Query(None, pattern=INCLUDE_PATTERN),
+    if_none_match: Optional[str] = Header(None),
+    _: Principal = Depends(get_current_admin_user),
+):
+    include_user = include == "user"
+    version = collection_versions.current(*listing_collections(include_user))
+    etag = collection_etag(
+        "members", version, skip=skip, limit=limit, cursor=cursor, include=include
+    )
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+
+    members = await fetch_member_page(
+        db, members_page_query(limit, skip, cursor), include_user
+    )
+    if len(members) > limit:
+        members = members[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(id=members[-1].id)
+    return member_page_response(members, response, include_user)
+
+
+@router.get("/members/search", response_model=List[MemberSearchResult])
+@query_budget(2)
+async def search_members(
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    email_prefix: Optional[str] = Query(None, min_length=1, max_length=255),
+    membership_status: Optional[bool] = Query(None, alias="status"),
+    start_from: Optional[datetime] = None,
+    start_to: Optional[datetime] = None,
+    end_from: Optional[datetime] = None,
+    end_to: Optional[datetime] = None,
+    sort: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    _: Principal = Depends(get_current_admin_user),
+):
+    # date ranges are half-open: *_from inclusive, *_to exclusive
+    search = MemberSearch(
+        email_prefix=email_prefix,
+        status=membership_status,
+        start_from=start_from,
+        start_to=start_to,
+        end_from=end_from,
+        end_to=end_to,
+    )
+    query, sort = member_search_query(search, sort, limit, cursor)
+    members = (await db.execute(query)).all()
+    if len(members) > limit:
+        members = members[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = next_search_cursor(sort, members[-1])
+    return member_page_response(members, response)
+
+
+@router.get("/members/export", response_class=StreamingResponse)
+@query_budget(2)
+async def export_members(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    session_factory=Depends(get_session_factory),
+    _: Principal = Depends(get_current_admin_user),
+):
+    return StreamingResponse(
+        stream_members(session_factory, export_format),
+        media_type=MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="members.{export_format}"'
+        },
+    )
+
+
 @router.get("/memberships", response_model=List[Member])
-def get_membership_records(
-    db: Session = Depends(get_db),
-    skip: int = 0,
-    limit: int = 100,
-    _: UserModel = Depends(get_current_admin_user),
+@query_budget(2)
+async def get_membership_records(
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include: Optional[str] = Query(None, pattern=INCLUDE_PATTERN),
+    if_none_match: Optional[str] = Header(None),
+    _: Principal = Depends(get_current_admin_user),
 ):
-    members = (
-        db.query(MemberModel)
-        .filter(MemberModel.membership_status == True)
-        .offset(skip)
-        .limit(limit)
-        .all()
+    include_user = include == "user"
+    version = collection_versions.current(*listing_collections(include_user))
+    etag = collection_etag(
+        "memberships",
+        version,
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+        include=include,
     )
-    return members
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+
+    members = await fetch_member_page(
+        db, membership_records_query(limit, skip, cursor), include_user
+    )
+    if len(members) > limit:
+        members = members[:limit]
+        last = members[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            end=last.membership_end, id=last.id
+        )
+    return member_page_response(members, response, include_user)
+
+
+@router.get("/admin/members/stats")
+@query_budget(1)
+async def get_membership_stats(_: Principal = Depends(get_current_admin_user)):
+    return membership_stats.snapshot()
+
+
+@router.get("/admin/metrics")
+@query_budget(1)
+async def get_runtime_metrics(_: Principal = Depends(get_current_admin_user)):
+    return collect()
@@ -1,12 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Request,
+    status,
+)
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Any
 from datetime import timedelta
 from jose import JWTError, jwt
 from ...schema.user import UserCreate, User
 from ...models.user import User as UserModel
-from ...database import get_db
+from ...database import get_db, get_session_factory, replica_router
 import os
 from dotenv import load_dotenv
 from jose.exceptions import JWTError
@@ -25,11 +34,20 @@ oauth2_scheme = OAuth2PasswordBearer(
 )  # Adjust the token URL
 
 
+from ...core.integrity import UNIQUE_VIOLATION, constraint_violation
+from ...core.config import settings
+from ...core.password_cost import password_cost
+from ...core.request_metrics import query_budget
 from ...core.security import (
-    verify_password,
-    get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
+    enforce_auth_rate_limit,
+    get_token_claims,
     get_current_user,
+    get_read_db,
+    rehash_password,
+    Principal,
     ACCESS_TOKEN_EXPIRE_MINUTES,
 )
 
@@ -37,73 +55,92 @@ from ...core.security import (
 router = APIRouter()
 
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(UserModel).filter(UserModel.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(UserModel).where(UserModel.email == email))
 
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user_by_email(db, email)
-    if not user or not verify_password(password, user.hashed_password):
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await get_user_by_email(db, email)
+    if not user or not await verify_password_async(password, user.hashed_password):
         return None
     return user
 
 
 # Endpoints
 @router.post("/signup", response_model=User, status_code=status.HTTP_201_CREATED)
-def signup(*, db: Session = Depends(get_db), user_in: UserCreate) -> Any:
-    user = get_user_by_email(db, email=user_in.email)
-    if user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered"
-        )
-
-    hashed_password = get_password_hash(user_in.password)
+@query_budget(2)
+async def signup(
+    *, request: Request, db: AsyncSession = Depends(get_db), user_in: UserCreate
+) -> Any:
+    enforce_auth_rate_limit(request, "signup", user_in.email)
+    hashed_password = await get_password_hash_async(user_in.password)
     db_user = UserModel(
         email=user_in.email, hashed_password=hashed_password, is_admin=False
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    try:
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        if constraint_violation(exc) == UNIQUE_VIOLATION:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered",
+            )
+        raise
+    if not db.get_bind().dialect.insert_returning:
+        # server defaults were not returned by the INSERT (MySQL)
+        await db.refresh(db_user)
+    # the new account has no session identity yet; keep its first reads
+    # (e.g. /auth/me) on the primary
+    replica_router.remember_write(db_user.email)
     return db_user
 
 
 @router.post("/login")
-def login(
-    db: Session = Depends(get_db), form_data: OAuth2PasswordRequestForm = Depends()
+@query_budget(2)
+async def login(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    session_factory=Depends(get_session_factory),
+    form_data: OAuth2PasswordRequestForm = Depends(),
 ) -> Any:
-    user = db.query(UserModel).filter(UserModel.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    enforce_auth_rate_limit(request, "login", form_data.username)
+    user = await authenticate_user(db, form_data.username, form_data.password)
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if settings.BCRYPT_REHASH_ON_LOGIN and password_cost.needs_rehash(
+        user.hashed_password
+    ):
+        # the only time the plaintext is at hand; done after the response
+        background_tasks.add_task(
+            rehash_password,
+            session_factory,
+            user.id,
+            user.hashed_password,
+            form_data.password,
+        )
     access_token_expires = timedelta(minutes=int(ACCESS_TOKEN_EXPIRE_MINUTES))
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=get_token_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-def get_current_admin_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-):
-    credentials_exception = HTTPException(status_code=403, detail="Not authorized")
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user_id = payload.get("sub")  # Assuming 'sub' stores user_id
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user or not user.is_admin:  # Check boolean field
-        raise credentials_exception
-
-    return user
-
-
 @router.get("/me", response_model=User)
-def read_users_me(current_user: User = Depends(get_current_user)) -> Any:
-    return current_user
+@query_budget(2)
+async def read_users_me(
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
+) -> Any:
+    user = await db.get(UserModel, current_user.id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+        )
+    return user
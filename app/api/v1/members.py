@@ -1,85 +1,147 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
+from ...core.config import settings
 from ...database import get_db
-from ...models.user import User as UserModel
 from ...models.member import Member as MemberModel
+from ...models.membership_event import MembershipEvent
 from ...schema.member import Member
+from ...core.etag import etag_matches, member_etag, not_modified, parse_member_etag
+from ...core.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from ...core.request_metrics import query_budget
+from ...core.security import Principal, get_read_db
+from ...services import renewal
 from ..deps import get_current_active_user
 
 router = APIRouter()
 
 
 @router.get("/", response_model=Member)
-def get_membership_status(
-    db: Session = Depends(get_db),
-    current_user: UserModel = Depends(get_current_active_user),
+@query_budget(2)
+async def get_membership_status(
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_active_user),
+    if_none_match: Optional[str] = Header(None),
 ):
-    member = (
-        db.query(MemberModel).filter(MemberModel.user_id == current_user.id).first()
+    member = await db.scalar(
+        select(MemberModel).where(MemberModel.user_id == current_user.id)
     )
 
     if not member:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Membership not found"
         )
+    etag = member_etag(member.id, member.version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return member
 
 
 @router.post("/renew")
-def renew_membership(
-    db: Session = Depends(get_db),
-    current_user: UserModel = Depends(get_current_active_user),
+@query_budget(4)
+async def renew_membership(
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user),
+    if_match: Optional[str] = Header(None),
+    stack: bool = False,
 ):
-    member = (
-        db.query(MemberModel).filter(MemberModel.user_id == current_user.id).first()
+    # Without If-Match, a repeat within the window (a double click, a client
+    # retry) is not applied and answered with "repeated": true and the first
+    # renewal's result; ?stack=true extends again
+    expected_version = None
+    if if_match is not None:
+        tag = parse_member_etag(if_match)
+        if tag is None:
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="Membership has changed, reload and retry",
+            )
+        expected_version = tag[1]
+
+    repeat_window = 0.0
+    if expected_version is None and not stack:
+        repeat_window = settings.RENEWAL_REPEAT_WINDOW_SECONDS
+    renewed = await renewal.renew_membership(
+        db, current_user.id, expected_version, repeat_window=repeat_window
     )
-
-    if not member:
+    if renewed is None:
+        if expected_version is not None and await db.scalar(
+            select(MemberModel.id).where(MemberModel.user_id == current_user.id)
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="Membership has changed, reload and retry",
+            )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Membership not found"
         )
 
-    new_start = max(member.membership_end, datetime.now())
-    member.membership_end = new_start + timedelta(days=30)
-    member.membership_status = True
-
-    db.commit()
-    db.refresh(member)
-
+    member = renewed.member
+    response.headers["ETag"] = member_etag(member.id, member.version)
     return {
-        "message": "Membership renewed successfully",
+        "message": (
+            "Membership was already renewed"
+            if renewed.repeated
+            else "Membership renewed successfully"
+        ),
         "new_end_date": member.membership_end,
+        "version": member.version,
+        "repeated": renewed.repeated,
     }
 
 
 @router.get("/history", response_model=List[dict])
-def get_membership_history(
-    db: Session = Depends(get_db),
-    current_user: UserModel = Depends(get_current_active_user),
+@query_budget(3)
+async def get_membership_history(
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user),
+    limit: int = Query(50, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
 ):
-    member = (
-        db.query(MemberModel).filter(MemberModel.user_id == current_user.id).first()
+    # newest first, keyset on (occurred_at, id) over the per-member index
+    query = (
+        select(MembershipEvent)
+        .join(MembershipEvent.member)
+        .where(MemberModel.user_id == current_user.id)
+        .order_by(MembershipEvent.occurred_at.desc(), MembershipEvent.id.desc())
+        .limit(limit + 1)
     )
+    if cursor:
+        last_at, last_id = decode_cursor(cursor, ["at", "id"], datetimes=["at"])
+        query = query.where(
+            tuple_(MembershipEvent.occurred_at, MembershipEvent.id)
+            < (last_at, last_id)
+        )
+    events = (await db.scalars(query)).all()
 
-    if not member:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Membership not found"
+    if not events and not cursor:
+        member_id = await db.scalar(
+            select(MemberModel.id).where(MemberModel.user_id == current_user.id)
+        )
+        if member_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Membership not found"
+            )
+
+    if len(events) > limit:
+        events = events[:limit]
+        last = events[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            at=last.occurred_at, id=last.id
         )
 
-    history = [
+    return [
         {
-            "event_type": "membership_start",
-            "date": member.membership_start,
-            "details": "Initial membership start",
-        },
-        {
-            "event_type": "membership_end",
-            "date": member.membership_end,
-            "details": "Current membership end date",
-        },
+            "event_type": event.event_type,
+            "date": event.occurred_at,
+            "details": event.details,
+            "membership_end": event.membership_end,
+        }
+        for event in events
     ]
-
-    return history
@@ -7,6 +7,102 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
 
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # put user id and role claims in access tokens so authorization needs no
+    # users query; role changes then take up to one token lifetime to apply
+    # in workers that did not process the change
+    JWT_EMBED_CLAIMS: bool = False
+
+    # connection pool; defaults match SQLAlchemy's QueuePool
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = -1
+    DB_POOL_PRE_PING: bool = False
+    # seconds between structured pool stats log lines, 0 disables them
+    DB_POOL_STATS_LOG_INTERVAL: float = 60
+    # connections opened during startup (capped at DB_POOL_SIZE), 0 disables
+    DB_POOL_WARMUP: int = 5
+    # create tables / run migrations and compile hot statements in the lifespan
+    DB_INIT_ON_STARTUP: bool = True
+    DB_PRECOMPILE_ON_STARTUP: bool = True
+
+    # with READ_REPLICA_DATABASE_URL set: how long a user's reads stay on the
+    # primary after they commit a write (keep above the replication lag), how
+    # many such users each worker tracks, and how long an unreachable replica
+    # is bypassed
+    READ_YOUR_WRITES_SECONDS: float = 5
+    READ_YOUR_WRITES_MAX_USERS: int = 10000
+    REPLICA_RETRY_SECONDS: float = 30
+
+    # per-route latency / SQL histograms, served in Prometheus format at /metrics
+    REQUEST_METRICS_ENABLED: bool = True
+    # statements slower than this many seconds are logged, 0 disables
+    SLOW_QUERY_THRESHOLD: float = 0.5
+    # identical statements per request flagged as a probable N+1, 0 disables
+    QUERY_REPEAT_THRESHOLD: int = 5
+    # raise on query budget / N+1 violations instead of logging (tests)
+    QUERY_BUDGET_STRICT: bool = False
+
+    # bcrypt runs on its own pool so login bursts can't starve other requests
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 32
+    # bcrypt cost (log2 rounds) for new hashes; 0 picks the highest cost within
+    # BCRYPT_TARGET_SECONDS per hash on first startup and stores it in
+    # app_settings for every worker. Hashes at another cost are redone at login
+    BCRYPT_ROUNDS: int = 0
+    BCRYPT_TARGET_SECONDS: float = 0.25
+    BCRYPT_MIN_ROUNDS: int = 10
+    BCRYPT_MAX_ROUNDS: int = 15
+    BCRYPT_REHASH_ON_LOGIN: bool = True
+
+    # token buckets on login and signup, checked before any DB or bcrypt work;
+    # a burst per client IP and per submitted username, refilled per minute
+    AUTH_RATE_LIMIT_ENABLED: bool = True
+    AUTH_RATE_LIMIT_IP_BURST: int = 20
+    AUTH_RATE_LIMIT_IP_PER_MINUTE: float = 20
+    AUTH_RATE_LIMIT_USER_BURST: int = 5
+    AUTH_RATE_LIMIT_USER_PER_MINUTE: float = 5
+    # buckets tracked per worker and limiter, least recently seen evicted first
+    AUTH_RATE_LIMIT_MAX_KEYS: int = 100000
+    # take the client IP from the last X-Forwarded-For hop (behind a proxy)
+    AUTH_RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False
+
+    # resolved principals per worker, keyed by token subject
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL: float = 60
+
+    # seconds between membership expiry sweeps, 0 disables the sweeper
+    MEMBERSHIP_EXPIRY_INTERVAL: float = 300
+    MEMBERSHIP_EXPIRY_BATCH_SIZE: int = 500
+
+    # seconds between recounts of the incremental membership stats, 0 disables
+    MEMBERSHIP_STATS_RECONCILE_INTERVAL: float = 300
+    MEMBERSHIP_STATS_NEW_MEMBER_DAYS: int = 30
+
+    # a renewal without If-Match arriving this many seconds or less after the
+    # previous one is taken as a repeat of it (double click, client retry):
+    # not applied again and answered with "repeated": true; ?stack=true opts
+    # out, 0 disables
+    RENEWAL_REPEAT_WINDOW_SECONDS: float = 30
+
+    # listing ETags come from per-worker write counters plus the number of
+    # the current window of this many seconds, so writes made through other
+    # workers show up in a worker's ETags within one window; 0 drops the
+    # window and is only right with a single worker
+    COLLECTION_VERSION_MAX_AGE: float = 5
+
+    # largest ?limit accepted by the paginated listings
+    MAX_PAGE_SIZE: int = 1000
+
+    MEMBER_IMPORT_MAX_ROWS: int = 50000
+    MEMBER_IMPORT_CHUNK_SIZE: int = 1000
+    # rows fetched per round trip by the streaming export
+    MEMBER_EXPORT_BATCH_SIZE: int = 1000
+
+    # member lists as plain column rows rendered with orjson (the json module
+    # if it isn't installed; see json_responses in /admin/metrics), skipping
+    # per-row pydantic validation
+    FAST_JSON_RESPONSES: bool = False
 
     def get_access_token_expiry(self) -> timedelta:
         return timedelta(minutes=self.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -0,0 +1,41 @@
+import hashlib
+import re
+from typing import Any, Optional, Sequence, Tuple
+
+from fastapi import Response, status
+
+_MEMBER_ETAG = re.compile(r'^(?:W/)?"member-(\d+)-(\d+)"$')
+
+
+def member_etag(member_id: int, version: int) -> str:
+    return f'"member-{member_id}-{version}"'
+
+
+def parse_member_etag(value: str) -> Optional[Tuple[int, int]]:
+    """``(member_id, version)`` from an ETag produced by ``member_etag``."""
+    match = _MEMBER_ETAG.match(value.strip())
+    if match is None:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+def collection_etag(name: str, version: Sequence[Any], **params: Any) -> str:
+    """Weak ETag for one view (``params``) of a collection at ``version``."""
+    key = repr((name, tuple(version), sorted(params.items())))
+    return f'W/"{name}-{hashlib.sha1(key.encode()).hexdigest()[:20]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of ``etag`` against an ``If-None-Match`` header."""
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
@@ -0,0 +1,29 @@
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+
+UNIQUE_VIOLATION = "unique"
+FOREIGN_KEY_VIOLATION = "foreign_key"
+
+# PostgreSQL SQLSTATEs, MySQL error numbers and SQLite message prefixes
+_SQLSTATES = {"23505": UNIQUE_VIOLATION, "23503": FOREIGN_KEY_VIOLATION}
+_MYSQL_ERRORS = {1062: UNIQUE_VIOLATION, 1452: FOREIGN_KEY_VIOLATION}
+_SQLITE_MESSAGES = {
+    "UNIQUE constraint failed": UNIQUE_VIOLATION,
+    "FOREIGN KEY constraint failed": FOREIGN_KEY_VIOLATION,
+}
+
+
+def constraint_violation(exc: IntegrityError) -> Optional[str]:
+    """Which kind of constraint a failed write hit, ``None`` if unrecognised."""
+    orig = exc.orig
+    sqlstate = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+    if sqlstate in _SQLSTATES:
+        return _SQLSTATES[sqlstate]
+    if orig.args and orig.args[0] in _MYSQL_ERRORS:
+        return _MYSQL_ERRORS[orig.args[0]]
+    message = str(orig)
+    for prefix, violation in _SQLITE_MESSAGES.items():
+        if message.startswith(prefix):
+            return violation
+    return None
@@ -0,0 +1,38 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Sequence
+
+from fastapi import HTTPException, status
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(**keys) -> str:
+    """Opaque token for the sort key of the last row on a page."""
+    payload = {
+        name: value.isoformat() if isinstance(value, datetime) else value
+        for name, value in keys.items()
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, fields: Sequence[str], datetimes: Sequence[str] = ()):
+    """Return the values of ``fields`` stored in ``cursor``, in order."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = []
+        for field in fields:
+            value = payload[field]
+            if field in datetimes:
+                value = datetime.fromisoformat(value)
+            values.append(value)
+        return values
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
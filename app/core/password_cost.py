@@ -0,0 +1,125 @@
+import re
+import statistics
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import bcrypt
+
+from .metrics import Histogram, register_collector
+
+# bcrypt.gensalt()'s own default, used until a cost has been configured
+DEFAULT_ROUNDS = 12
+
+_COST = re.compile(r"^\$2[abxy]?\$(\d\d)\$")
+_CALIBRATION_PASSWORD = b"calibration-password"
+
+
+def hash_cost(hashed: str) -> Optional[int]:
+    """The log2 rounds a bcrypt hash was made with, None if it isn't bcrypt."""
+    match = _COST.match(hashed or "")
+    return int(match.group(1)) if match else None
+
+
+def time_hash(rounds: int, samples: int) -> List[float]:
+    """Seconds taken by ``samples`` bcrypt hashes at ``rounds``."""
+    timings = []
+    for _ in range(samples):
+        salt = bcrypt.gensalt(rounds=rounds)
+        started = time.perf_counter()
+        bcrypt.hashpw(_CALIBRATION_PASSWORD, salt)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def calibrate(
+    target_seconds: float, min_rounds: int, max_rounds: int, samples: int = 3
+) -> Tuple[int, Dict[int, float]]:
+    """The highest cost whose median hash time is within ``target_seconds``.
+
+    Returns the cost, clamped to ``[min_rounds, max_rounds]``, and the median
+    seconds of every cost timed. Each round doubles the work, so timing stops
+    as soon as the next cost is predicted to miss the target; calibrating
+    therefore costs about ``2 * samples * target_seconds``.
+    """
+    medians: Dict[int, float] = {}
+    rounds = min_rounds
+    while True:
+        medians[rounds] = statistics.median(time_hash(rounds, samples))
+        if rounds >= max_rounds or medians[rounds] * 2 > target_seconds:
+            break
+        rounds += 1
+    within = [cost for cost, seconds in medians.items() if seconds <= target_seconds]
+    return max(within, default=min_rounds), medians
+
+
+class PasswordCost:
+    """The bcrypt cost new hashes use, and how long hashing actually takes.
+
+    Verify times are kept per stored cost, so the distribution shows how
+    much of the login load still runs on hashes awaiting a rehash.
+    """
+
+    def __init__(self, rounds: int = DEFAULT_ROUNDS):
+        self.rounds = rounds
+        self.source = "default"
+        self.calibration: Dict[int, float] = {}
+        self.hash_seconds = Histogram()
+        self.verify_seconds: Dict[int, Histogram] = {}
+        self.rehashes = 0
+        self._lock = threading.Lock()
+
+    def configure(
+        self, rounds: int, source: str, calibration: Optional[Dict[int, float]] = None
+    ) -> None:
+        self.rounds = rounds
+        self.source = source
+        self.calibration = dict(calibration or {})
+
+    def needs_rehash(self, hashed: str) -> bool:
+        cost = hash_cost(hashed)
+        return cost is not None and cost != self.rounds
+
+    def observe_hash(self, seconds: float) -> None:
+        self.hash_seconds.observe(seconds)
+
+    def observe_verify(self, seconds: float, cost: Optional[int]) -> None:
+        # anything that isn't bcrypt is filed under cost 0
+        cost = cost or 0
+        histogram = self.verify_seconds.get(cost)
+        if histogram is None:
+            with self._lock:
+                histogram = self.verify_seconds.setdefault(cost, Histogram())
+        histogram.observe(seconds)
+
+    def record_rehash(self) -> None:
+        with self._lock:
+            self.rehashes += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.hash_seconds = Histogram()
+            self.verify_seconds = {}
+            self.rehashes = 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            verify = sorted(self.verify_seconds.items())
+            rehashes = self.rehashes
+        return {
+            "rounds": self.rounds,
+            "source": self.source,
+            "calibration_seconds": {
+                str(cost): round(seconds, 6)
+                for cost, seconds in sorted(self.calibration.items())
+            },
+            "hash_seconds": self.hash_seconds.snapshot(),
+            "verify_seconds": {
+                str(cost): histogram.snapshot() for cost, histogram in verify
+            },
+            "rehashes": rehashes,
+        }
+
+
+password_cost = PasswordCost()
+register_collector("password_hashing", password_cost.snapshot)
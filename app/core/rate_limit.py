@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+class TokenBucketLimiter:
+    """Thread-safe per-key token buckets held in a bounded LRU map.
+
+    Each key may spend ``burst`` requests at once and regains ``rate`` per
+    second. A check is one dict lookup and a ``move_to_end``; past
+    ``maxsize`` keys the least recently seen bucket is dropped, which at
+    worst hands that key a fresh burst.
+    """
+
+    def __init__(self, burst: int, rate: float, maxsize: int):
+        self.burst = burst
+        self.rate = rate
+        self.maxsize = maxsize
+        self.allowed = 0
+        self.rejected = 0
+        self.evictions = 0
+        # key -> (tokens left, monotonic time they were counted)
+        self._buckets: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.burst > 0 and self.rate > 0 and self.maxsize > 0
+
+    def acquire(self, key: Hashable) -> float:
+        """Spend a token for ``key``; returns 0, or the seconds until one is free."""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = self.burst
+            else:
+                tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                self._buckets.move_to_end(key)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+                self.allowed += 1
+            else:
+                wait = (1 - tokens) / self.rate
+                self.rejected += 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        return wait
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "keys": len(self._buckets),
+                "maxsize": self.maxsize,
+                "burst": self.burst,
+                "rate_per_second": self.rate,
+                "allowed": self.allowed,
+                "rejected": self.rejected,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,252 @@
+import json
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .config import settings
+from .metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# statements per request
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestQueries:
+    """SQL statements issued while serving the current request."""
+
+    __slots__ = ("scope", "count", "seconds", "statements")
+
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.count = 0
+        self.seconds = 0.0
+        # executions per distinct SQL string, for N+1 detection
+        self.statements: Dict[str, int] = {}
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+
+
+# set by the middleware, filled in by the engine's cursor hooks
+current_request: ContextVar[Optional[RequestQueries]] = ContextVar(
+    "current_request", default=None
+)
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "queries", "db_time", "statuses")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.db_time = Histogram()
+        self.statuses: Dict[int, int] = {}
+
+
+class HttpMetrics:
+    """Latency, query count and DB time histograms per (method, route)."""
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self._lock = threading.Lock()
+
+    def observe(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        seconds: float,
+        queries: RequestQueries,
+    ) -> None:
+        key = (method, route)
+        metrics = self._routes.get(key)
+        if metrics is None:
+            with self._lock:
+                metrics = self._routes.setdefault(key, RouteMetrics())
+        metrics.latency.observe(seconds)
+        metrics.queries.observe(queries.count)
+        metrics.db_time.observe(queries.seconds)
+        with self._lock:
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            routes = sorted(self._routes.items())
+            statuses = [(key, dict(metrics.statuses)) for key, metrics in routes]
+
+        lines: List[str] = [
+            "# HELP http_requests_total Requests served, by route and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route), counts in statuses:
+            for status, count in sorted(counts.items()):
+                labels = _labels(method=method, route=route, status=str(status))
+                lines.append(f"http_requests_total{{{labels}}} {count}")
+
+        for name, attribute, help_text in (
+            (
+                "http_request_duration_seconds",
+                "latency",
+                "Request latency, by route.",
+            ),
+            (
+                "http_request_db_queries",
+                "queries",
+                "SQL statements issued per request, by route.",
+            ),
+            (
+                "http_request_db_seconds",
+                "db_time",
+                "Time spent executing SQL per request, by route.",
+            ),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (method, route), metrics in routes:
+                labels = _labels(method=method, route=route)
+                snapshot = getattr(metrics, attribute).snapshot()
+                for bound, count in snapshot["buckets"].items():
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f"{name}_sum{{{labels}}} {snapshot['sum']}")
+                lines.append(f"{name}_count{{{labels}}} {snapshot['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+http_metrics = HttpMetrics()
+
+
+def route_template(scope) -> str:
+    """The matched route's full path template, e.g. ``/api/v1/members/{member_id}``."""
+    template = getattr(scope.get("route"), "path_format", None)
+    if template is None:
+        return UNMATCHED_ROUTE
+    # routes of included routers may only know their path relative to the
+    # router's prefix; recover the prefix from the concrete request path
+    try:
+        rendered = template.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return template
+    path = scope["path"]
+    if rendered and path.endswith(rendered):
+        return path[: len(path) - len(rendered)] + template
+    return template
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def query_budget(
+    max_queries: Optional[int] = None, max_repeats: Optional[int] = None
+):
+    """Declare how many SQL statements one call of a route handler may issue.
+
+    ``max_repeats`` overrides ``QUERY_REPEAT_THRESHOLD`` for handlers that
+    legitimately run one statement many times, e.g. chunked imports.
+    Violations are logged, or raised when ``QUERY_BUDGET_STRICT`` is set.
+    """
+
+    def declare(endpoint: Callable) -> Callable:
+        endpoint.query_budget = max_queries
+        endpoint.query_repeat_limit = max_repeats
+        return endpoint
+
+    return declare
+
+
+def check_query_budget(scope, queries: RequestQueries) -> None:
+    endpoint = scope.get("endpoint")
+    budget = getattr(endpoint, "query_budget", None)
+    repeat_limit = getattr(endpoint, "query_repeat_limit", None)
+    if repeat_limit is None:
+        repeat_limit = settings.QUERY_REPEAT_THRESHOLD
+
+    problems = []
+    if budget is not None and queries.count > budget:
+        problems.append(
+            {
+                "event": "query_budget_exceeded",
+                "queries": queries.count,
+                "budget": budget,
+            }
+        )
+    if repeat_limit > 0:
+        problems.extend(
+            {
+                "event": "probable_n_plus_one",
+                "statement": statement,
+                "executions": executions,
+            }
+            for statement, executions in queries.statements.items()
+            if executions >= repeat_limit
+        )
+    if not problems:
+        return
+
+    route = route_template(scope)
+    for problem in problems:
+        logger.warning(
+            json.dumps({**problem, "method": scope["method"], "route": route})
+        )
+    if settings.QUERY_BUDGET_STRICT:
+        raise QueryBudgetExceeded(
+            f"{scope['method']} {route}: "
+            + "; ".join(json.dumps(problem) for problem in problems)
+        )
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware timing each HTTP request against its route template.
+
+    The route label is the matched path template rather than the request
+    path, so label cardinality is bounded by the number of routes.
+    """
+
+    def __init__(self, app, metrics: HttpMetrics = http_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        queries = RequestQueries(scope)
+        token = current_request.set(queries)
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            self.metrics.observe(
+                scope["method"], route_template(scope), status, elapsed, queries
+            )
+        check_query_budget(scope, queries)
@@ -0,0 +1,58 @@
+import json
+from datetime import date, datetime
+from typing import Sequence, Type
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from .config import settings
+from .metrics import register_collector
+
+try:
+    import orjson
+except ImportError:  # listed in requirement.txt; rendering falls back to json
+    orjson = None
+
+# which module FastJSONResponse encodes with, reported at startup and in
+# /admin/metrics since a missing orjson only shows up as slower responses
+JSON_ENCODER = "orjson" if orjson is not None else "json"
+
+
+def schema_columns(schema: Type[BaseModel], model) -> list:
+    """``model`` columns named after ``schema``'s fields, in field order."""
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """Renders content that already has the response schema's shape.
+
+    Meant for rows selected with ``schema_columns``: they come straight from
+    typed columns, so pydantic validation and ``jsonable_encoder`` are
+    skipped and the payload is encoded once, with orjson when installed.
+    """
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            # "Z" for UTC, as pydantic renders it
+            return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+        return json.dumps(
+            content, default=_json_default, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+def rows_response(rows: Sequence, headers=None) -> FastJSONResponse:
+    # zip over the shared key tuple; Row._asdict() is several times slower
+    fields = rows[0]._fields if rows else ()
+    return FastJSONResponse([dict(zip(fields, row)) for row in rows], headers=headers)
+
+
+register_collector(
+    "json_responses",
+    lambda: {"fast": settings.FAST_JSON_RESPONSES, "encoder": JSON_ENCODER},
+)
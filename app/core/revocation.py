@@ -0,0 +1,44 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenRevocations:
+    """Per-user "tokens issued at or before this instant are invalid" marks.
+
+    Marks and ``iat`` claims are sub-second ``time.time()`` values, so a
+    token issued right after a revocation, e.g. at the re-login following a
+    role change, is not caught by it.
+
+    A mark only matters while tokens issued before it can still be unexpired,
+    so entries older than ``max_token_age`` seconds are pruned on write and
+    the map stays bounded by the number of users changed within one token
+    lifetime.
+    """
+
+    def __init__(self, max_token_age: float):
+        self.max_token_age = max_token_age
+        self._valid_after: "OrderedDict[int, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def revoke_user(self, user_id: int) -> None:
+        now = time.time()
+        with self._lock:
+            self._valid_after.pop(user_id, None)
+            self._valid_after[user_id] = now
+            while self._valid_after:
+                oldest = next(iter(self._valid_after.values()))
+                if oldest >= now - self.max_token_age:
+                    break
+                self._valid_after.popitem(last=False)
+
+    def is_revoked(self, user_id: int, issued_at: float) -> bool:
+        revoked_at = self._valid_after.get(user_id)
+        return revoked_at is not None and issued_at <= revoked_at
+
+    def clear(self) -> None:
+        with self._lock:
+            self._valid_after.clear()
+
+    def __len__(self) -> int:
+        return len(self._valid_after)
@@ -1,13 +1,27 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from ..database import get_db
+from ..database import get_db, get_replica_session_factory, replica_router
+from .cache import TTLCache
+from .config import settings
+from .executor import BoundedExecutor, ExecutorSaturated
+from .metrics import register_collector
+from .password_cost import hash_cost, password_cost
+from .rate_limit import TokenBucketLimiter
+from .revocation import TokenRevocations
 from ..models.user import User
+from ..services.collection_versions import USERS, collection_versions
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
+import math
 import os
+import time
+import uuid
 import bcrypt
 from dotenv import load_dotenv
 
@@ -21,15 +35,173 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(
+    tokenUrl="/api/v1/auth/login", auto_error=False
+)
+
+password_hasher = BoundedExecutor(
+    "password-hasher",
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
+register_collector("password_hasher", password_hasher.snapshot)
+
+ip_rate_limiter = TokenBucketLimiter(
+    burst=settings.AUTH_RATE_LIMIT_IP_BURST,
+    rate=settings.AUTH_RATE_LIMIT_IP_PER_MINUTE / 60,
+    maxsize=settings.AUTH_RATE_LIMIT_MAX_KEYS,
+)
+user_rate_limiter = TokenBucketLimiter(
+    burst=settings.AUTH_RATE_LIMIT_USER_BURST,
+    rate=settings.AUTH_RATE_LIMIT_USER_PER_MINUTE / 60,
+    maxsize=settings.AUTH_RATE_LIMIT_MAX_KEYS,
+)
+register_collector(
+    "auth_rate_limit",
+    lambda: {"ip": ip_rate_limiter.snapshot(), "user": user_rate_limiter.snapshot()},
+)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Authenticated identity, detached from any session so it can be cached."""
+
+    id: int
+    email: str
+    is_active: bool
+    is_admin: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_active=bool(user.is_active),
+            is_admin=bool(user.is_admin),
+        )
+
+
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL
+)
+register_collector("principal_cache", principal_cache.snapshot)
+
+# only consulted for claim-carrying tokens; DB-backed principals are evicted
+token_revocations = TokenRevocations(
+    max_token_age=max(ACCESS_TOKEN_EXPIRE_MINUTES, 15) * 60
+)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    started = time.perf_counter()
+    try:
+        return pwd_context.verify(plain_password, hashed_password)
+    finally:
+        password_cost.observe_verify(
+            time.perf_counter() - started, hash_cost(hashed_password)
+        )
 
 
 def get_password_hash(password: str) -> str:
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode("utf-8"), salt).decode("utf-8")
+    salt = bcrypt.gensalt(rounds=password_cost.rounds)
+    started = time.perf_counter()
+    hashed = bcrypt.hashpw(password.encode("utf-8"), salt).decode("utf-8")
+    password_cost.observe_hash(time.perf_counter() - started)
+    return hashed
+
+
+async def _run_password_hasher(fn, *args):
+    try:
+        return await password_hasher.run(fn, *args)
+    except ExecutorSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service is busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+
+
+def client_address(request: Request) -> str:
+    if settings.AUTH_RATE_LIMIT_TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            # the last hop is the one our proxy appended; earlier ones are
+            # whatever the client sent
+            return forwarded.rsplit(",", 1)[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def enforce_auth_rate_limit(request: Request, action: str, username: str) -> None:
+    """Reject ``action`` with 429 once the client IP or username is over budget.
+
+    Called first thing in the login and signup handlers, so a rejected
+    attempt costs neither a users query nor a bcrypt round.
+    """
+    if not settings.AUTH_RATE_LIMIT_ENABLED:
+        return
+    wait = ip_rate_limiter.acquire((action, client_address(request)))
+    if not wait:
+        # emails are at most 254 characters; longer input can't match a user
+        wait = user_rate_limiter.acquire((action, username[:254].strip().lower()))
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please retry later",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_password_hasher(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_password_hasher(get_password_hash, password)
+
+
+async def rehash_password(
+    session_factory, user_id: int, old_hash: str, password: str
+) -> bool:
+    """Re-hash a just-verified password at the current cost.
+
+    Runs after the login response is sent. The UPDATE only applies while the
+    stored hash is still ``old_hash``, so a password change made meanwhile
+    is never overwritten; when the hasher is busy the upgrade is left for a
+    later login rather than queued behind interactive requests.
+    """
+    try:
+        new_hash = await password_hasher.run(get_password_hash, password)
+    except ExecutorSaturated:
+        return False
+    async with session_factory() as db:
+        result = await db.execute(
+            update(User)
+            .where(User.id == user_id, User.hashed_password == old_hash)
+            .values(hashed_password=new_hash)
+        )
+        if result.rowcount != 1:
+            return False
+        await db.commit()
+    # updated_at changed, and it is part of ?include=user rows
+    collection_versions.bump(USERS)
+    password_cost.record_rehash()
+    return True
+
+
+def get_token_claims(user: User) -> dict:
+    claims = {"sub": user.email}
+    if settings.JWT_EMBED_CLAIMS:
+        # lets deps authorize without a users query; a role change is picked
+        # up at the next login, or earlier through token_revocations
+        claims.update(
+            uid=user.id,
+            act=bool(user.is_active),
+            adm=bool(user.is_admin),
+            # fractional, so revocations in the same second don't catch it
+            iat=time.time(),
+            jti=uuid.uuid4().hex,
+        )
+    return claims
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -43,9 +215,17 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-) -> User:
+async def get_current_user(
+    db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)
+) -> Principal:
+    principal = await _resolve_principal(db, token)
+    # lets the replica router send this user's next reads to the primary
+    # once this session commits a write
+    db.info["reader"] = principal.email
+    return principal
+
+
+async def _resolve_principal(db: AsyncSession, token: str) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -59,7 +239,102 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.email == email).first()
+    if settings.JWT_EMBED_CLAIMS and "uid" in payload:
+        if token_revocations.is_revoked(payload["uid"], payload.get("iat", 0)):
+            raise credentials_exception
+        return Principal(
+            id=payload["uid"],
+            email=email,
+            is_active=payload.get("act", False),
+            is_admin=payload.get("adm", False),
+        )
+
+    principal = principal_cache.get(email)
+    if principal is not None:
+        return principal
+
+    user = await db.scalar(select(User).where(User.email == email))
     if user is None:
         raise credentials_exception
-    return user
+    principal = Principal.from_user(user)
+    principal_cache.set(email, principal)
+    return principal
+
+
+async def get_read_db(
+    primary: AsyncSession = Depends(get_db),
+    replica_factory=Depends(get_replica_session_factory),
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+):
+    """Session for read-only handlers: the replica when one is configured.
+
+    Falls back to the request's primary session when no replica is set up,
+    when the caller wrote recently (read-your-writes), or when the replica
+    can't be reached. Callers are told apart by their token's subject, read
+    without verification: it only picks a database, the handler's own auth
+    dependency still validates the token.
+    """
+    if replica_factory is None or not replica_router.use_replica(
+        _token_subject(token)
+    ):
+        yield primary
+        return
+    replica = await replica_router.open(replica_factory)
+    if replica is None:
+        yield primary
+        return
+    async with replica:
+        yield replica
+
+
+def _token_subject(token: Optional[str]) -> Optional[str]:
+    if not token:
+        return None
+    try:
+        return jwt.get_unverified_claims(token).get("sub")
+    except JWTError:
+        return None
+
+
+# Cached principals are evicted, and claim-carrying tokens revoked, once a
+# flush that changed or deleted their user commits. Bulk UPDATE/DELETE
+# statements bypass these hooks and must call invalidate_principal themselves.
+_PRINCIPAL_FIELDS = ("email", "is_active", "is_admin")
+
+
+def invalidate_principal(email: str, user_id: int) -> None:
+    principal_cache.pop(email)
+    token_revocations.revoke_user(user_id)
+
+
+def _stale_principals(target: User) -> set:
+    session = inspect(target).session
+    if session is None:
+        return set()
+    return session.info.setdefault("stale_principals", set())
+
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target: User) -> None:
+    state = inspect(target)
+    if not any(state.attrs[field].history.has_changes() for field in _PRINCIPAL_FIELDS):
+        return
+    stale = _stale_principals(target)
+    stale.add((target.email, target.id))
+    stale.update((email, target.id) for email in state.attrs.email.history.deleted)
+
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, connection, target: User) -> None:
+    _stale_principals(target).add((target.email, target.id))
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_stale_principals(session: Session) -> None:
+    for email, user_id in session.info.pop("stale_principals", ()):
+        invalidate_principal(email, user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_stale_principals(session: Session, previous_transaction) -> None:
+    session.info.pop("stale_principals", None)
@@ -1,23 +1,417 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from contextlib import AsyncExitStack
 from dotenv import load_dotenv
+import json
+import logging
 import os
+import threading
+import time
+from typing import Optional
+
+from .core.cache import TTLCache
+from .core.config import settings
+from .core.metrics import Histogram, register_collector
+from .core.request_metrics import current_request, route_template
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+# optional read-only replica for the heavy GET handlers, see get_read_db
+READ_REPLICA_DATABASE_URL = os.getenv("READ_REPLICA_DATABASE_URL")
+
+# asyncio DBAPI used for each backend when DATABASE_URL names a sync driver
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "mysql": "aiomysql",
+    "postgresql": "asyncpg",
+}
+
+
+def get_async_database_url(database_url: str):
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if url.get_dialect().is_async or backend not in ASYNC_DRIVERS:
+        return url
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def get_pool_options(database_url: str) -> dict:
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # in-memory SQLite runs on a single static connection, nothing to size
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+class PoolStats:
+    def __init__(self):
+        self.checkout_latency = Histogram()
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+        self.peak_checked_out = 0
+        self.peak_overflow = 0
+        self._last_log = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record_checkout(self, pool, elapsed: float, waited: bool) -> None:
+        self.checkout_latency.observe(elapsed)
+        with self._lock:
+            self.checkouts += 1
+            if waited:
+                self.waits += 1
+                self.wait_time += elapsed
+            self.peak_checked_out = max(self.peak_checked_out, pool.checkedout())
+            self.peak_overflow = max(self.peak_overflow, pool.overflow())
+
+        interval = settings.DB_POOL_STATS_LOG_INTERVAL
+        now = time.monotonic()
+        if interval > 0 and now - self._last_log >= interval:
+            self._last_log = now
+            self.log(pool)
+
+    def record_timeout(self, pool) -> None:
+        with self._lock:
+            self.timeouts += 1
+        self.log(pool, level=logging.WARNING)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            counters = {
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_time_seconds": self.wait_time,
+                "timeouts": self.timeouts,
+                "peak_checked_out": self.peak_checked_out,
+                "peak_overflow": self.peak_overflow,
+            }
+        return {
+            "pool": type(pool).__name__,
+            "size": pool.size() if hasattr(pool, "size") else None,
+            "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+            "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+            "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+            **counters,
+            "checkout_latency_seconds": self.checkout_latency.snapshot(),
+        }
+
+    def log(self, pool, level: int = logging.INFO) -> None:
+        snapshot = self.snapshot(pool)
+        snapshot.pop("checkout_latency_seconds")
+        logger.log(level, json.dumps({"event": "db_pool_stats", **snapshot}))
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that feeds checkout latency and waits into ``pool_stats``."""
+
+    def connect(self):
+        capacity = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+        waited = settings.DB_MAX_OVERFLOW >= 0 and self.checkedout() >= capacity
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            pool_stats.record_timeout(self)
+            raise
+        pool_stats.record_checkout(self, time.perf_counter() - started, waited)
+        return connection
+
+
+def enable_sqlite_foreign_keys(engine) -> None:
+    """SQLite only enforces FOREIGN KEY clauses when asked to, per connection."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if sync_engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _foreign_keys_on(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def parameters_shape(parameters, executemany: bool = False):
+    """Types of the bound parameters, never their values."""
+    if executemany:
+        rows = list(parameters)
+        return {"rows": len(rows), "row": parameters_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+
+def log_slow_query(statement, parameters, executemany, seconds, queries) -> None:
+    scope = queries.scope if queries is not None else None
+    logger.warning(
+        json.dumps(
+            {
+                "event": "slow_query",
+                "duration_seconds": round(seconds, 6),
+                "statement": statement,
+                "parameters": parameters_shape(parameters, executemany),
+                "method": scope["method"] if scope else None,
+                "route": route_template(scope) if scope else None,
+            }
+        )
+    )
+
+
+def instrument_queries(engine) -> None:
+    """Time statements for the slow-query log and the current request's totals."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _query_started(conn, cursor, statement, parameters, context, executemany):
+        # per execution, so a failed statement leaves nothing behind
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _query_finished(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - context._query_started
+        queries = current_request.get()
+        if queries is not None:
+            queries.record(statement, seconds)
+        if 0 < settings.SLOW_QUERY_THRESHOLD <= seconds:
+            log_slow_query(statement, parameters, executemany, seconds, queries)
 
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-print("Database connected")
 Base = declarative_base()
 
+# engines are built on first use, normally by the app lifespan, so importing
+# the app neither connects nor introspects the database
+_engine = None
+_async_engine = None
+_replica_engine = None
+_engine_lock = threading.Lock()
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(
+    class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+ReplicaSessionLocal = async_sessionmaker(
+    class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+
+def get_engine():
+    """The sync engine, for schema setup and scripts."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine(
+                SQLALCHEMY_DATABASE_URL, **get_pool_options(SQLALCHEMY_DATABASE_URL)
+            )
+            enable_sqlite_foreign_keys(_engine)
+            instrument_queries(_engine)
+            SessionLocal.configure(bind=_engine)
+    return _engine
+
 
-def get_db():
-    db = SessionLocal()
-    try:
+def get_async_engine():
+    global _async_engine
+    with _engine_lock:
+        if _async_engine is None:
+            pool_options = get_pool_options(SQLALCHEMY_DATABASE_URL)
+            if pool_options:
+                pool_options["poolclass"] = InstrumentedAsyncAdaptedQueuePool
+            _async_engine = create_async_engine(
+                get_async_database_url(SQLALCHEMY_DATABASE_URL), **pool_options
+            )
+            enable_sqlite_foreign_keys(_async_engine)
+            instrument_queries(_async_engine)
+            AsyncSessionLocal.configure(bind=_async_engine)
+            logger.info("database engine created")
+    return _async_engine
+
+
+def get_replica_engine():
+    """The read replica's engine, or None when no replica is configured."""
+    global _replica_engine
+    if not READ_REPLICA_DATABASE_URL:
+        return None
+    with _engine_lock:
+        if _replica_engine is None:
+            pool_options = get_pool_options(READ_REPLICA_DATABASE_URL)
+            if pool_options:
+                pool_options["poolclass"] = AsyncAdaptedQueuePool
+            _replica_engine = create_async_engine(
+                get_async_database_url(READ_REPLICA_DATABASE_URL), **pool_options
+            )
+            instrument_queries(_replica_engine)
+            ReplicaSessionLocal.configure(bind=_replica_engine)
+            logger.info("read replica engine created")
+    return _replica_engine
+
+
+async def dispose_engines() -> None:
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _replica_engine is not None:
+        await _replica_engine.dispose()
+    if _engine is not None:
+        _engine.dispose()
+
+
+async def warm_pool(connections: int) -> int:
+    """Open up to ``connections`` pooled connections ahead of the first requests."""
+    engine = get_async_engine()
+    pool = engine.sync_engine.pool
+    if not isinstance(pool, QueuePool):
+        # NullPool / in-memory SQLite: nothing is kept to warm
+        return 0
+    connections = min(connections, pool.size())
+    async with AsyncExitStack() as stack:
+        for _ in range(connections):
+            connection = await stack.enter_async_context(engine.connect())
+            await connection.exec_driver_sql("SELECT 1")
+    return connections
+
+
+async def precompile(statements) -> None:
+    """Run ``statements`` once, rolled back, so their compiled SQL is cached."""
+    async with get_session_factory()() as db:
+        for statement in statements:
+            await db.execute(statement)
+        await db.rollback()
+
+
+register_collector(
+    "db_pool", lambda: pool_stats.snapshot(get_async_engine().sync_engine.pool)
+)
+
+
+def get_session_factory():
+    """For handlers whose DB work outlives the request scope, e.g. streaming."""
+    get_async_engine()
+    return AsyncSessionLocal
+
+
+async def get_db():
+    async with get_session_factory()() as db:
         yield db
-    finally:
-        db.close()
+
+
+def get_replica_session_factory():
+    """Session factory for the read replica, None when reads stay on the primary."""
+    if get_replica_engine() is None:
+        return None
+    return ReplicaSessionLocal
+
+
+class ReplicaRouter:
+    """Decides per request whether a safe read may be served by the replica.
+
+    Readers are keyed by token subject (email). Those who committed a write
+    within ``READ_YOUR_WRITES_SECONDS`` read from the primary, so they see
+    their own changes despite replication lag. Marks are per worker: with
+    several workers behind a non-sticky balancer a follow-up read can still
+    land on a worker that hasn't seen the write. A replica that fails to
+    connect is skipped for ``REPLICA_RETRY_SECONDS``.
+    """
+
+    def __init__(self):
+        self.recent_writers = TTLCache(
+            maxsize=settings.READ_YOUR_WRITES_MAX_USERS,
+            ttl=settings.READ_YOUR_WRITES_SECONDS,
+        )
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.fallbacks = 0
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+
+    def remember_write(self, reader: str) -> None:
+        self.recent_writers.set(reader, True)
+
+    def use_replica(self, reader: Optional[str]) -> bool:
+        if time.monotonic() < self._down_until or (
+            reader is not None and self.recent_writers.get(reader)
+        ):
+            with self._lock:
+                self.primary_reads += 1
+            return False
+        return True
+
+    async def open(self, factory) -> Optional[AsyncSession]:
+        """A replica session with its connection checked out, or None to fall back."""
+        session = factory()
+        try:
+            await session.connection()
+        except (DBAPIError, OSError) as exc:
+            await session.close()
+            with self._lock:
+                self.fallbacks += 1
+                self._down_until = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+            logger.warning(
+                json.dumps(
+                    {
+                        "event": "replica_unavailable",
+                        "error": type(exc).__name__,
+                        "retry_in_seconds": settings.REPLICA_RETRY_SECONDS,
+                    }
+                )
+            )
+            return None
+        with self._lock:
+            self.replica_reads += 1
+        return session
+
+    def clear(self) -> None:
+        self.recent_writers.clear()
+        with self._lock:
+            self.replica_reads = self.primary_reads = self.fallbacks = 0
+            self._down_until = 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "configured": bool(READ_REPLICA_DATABASE_URL),
+                "available": time.monotonic() >= self._down_until,
+                "replica_reads": self.replica_reads,
+                "primary_reads": self.primary_reads,
+                "fallbacks": self.fallbacks,
+                "recent_writers": len(self.recent_writers),
+            }
+
+
+replica_router = ReplicaRouter()
+register_collector("db_replica", replica_router.snapshot)
+
+
+# get_current_user tags the request's primary session with the caller's
+# email (their token subject); once that session commits a flush, the caller
+# reads from the primary for a while. Anonymous writes (signup) call
+# remember_write directly.
+@event.listens_for(Session, "after_flush")
+def _note_write(session: Session, flush_context) -> None:
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_writer(session: Session) -> None:
+    reader = session.info.get("reader")
+    if session.info.pop("wrote", False) and reader is not None:
+        replica_router.remember_write(reader)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_write(session: Session, previous_transaction) -> None:
+    session.info.pop("wrote", None)
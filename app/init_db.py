@@ -1,8 +1,12 @@
-from .database import Base, engine
+from .database import Base, get_engine
+from .migrations import run_migrations
+from . import models  # noqa: F401  register tables on Base.metadata
 
 
 def init_db():
+    engine = get_engine()
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
 
 
 if __name__ == "__main__":
@@ -1,12 +1,85 @@
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
-from .database import engine, Base
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import select
+
+from .api.v1.admin import members_page_query, membership_records_query
 from .api.v1.router import api_router
+from .core.config import settings
+from .core.request_metrics import RequestMetricsMiddleware, http_metrics
+from .core.responses import JSON_ENCODER
+from .database import dispose_engines, precompile, warm_pool
+from .init_db import init_db
+from .models import Member, User
+from .services.expiry import run_expiry_sweeper
+from .services.membership_stats import run_stats_reconciler
+from .services.password_cost import configure_password_cost
+
+logger = logging.getLogger(__name__)
+
+
+def hot_statements() -> list:
+    """Statements behind the most frequent requests, compiled during startup."""
+    return [
+        select(User).where(User.email == ""),
+        select(Member).where(Member.user_id == 0),
+        members_page_query(100),
+        membership_records_query(100),
+    ]
 
 
-Base.metadata.create_all(bind=engine)
+async def startup() -> None:
+    started = time.perf_counter()
+    if settings.DB_INIT_ON_STARTUP:
+        await asyncio.to_thread(init_db)
+    hashing = await configure_password_cost()
+    warmed = await warm_pool(settings.DB_POOL_WARMUP)
+    if settings.DB_PRECOMPILE_ON_STARTUP:
+        await precompile(hot_statements())
+    logger.info(
+        json.dumps(
+            {
+                "event": "startup",
+                "warm_connections": warmed,
+                "bcrypt_rounds": hashing["rounds"],
+                "bcrypt_rounds_source": hashing["source"],
+                "json_encoder": JSON_ENCODER,
+                "duration_seconds": round(time.perf_counter() - started, 6),
+            }
+        )
+    )
 
 
-app = FastAPI(title="Fitness Center Management")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup()
+    tasks = []
+    if settings.MEMBERSHIP_EXPIRY_INTERVAL > 0:
+        tasks.append(
+            asyncio.create_task(run_expiry_sweeper(settings.MEMBERSHIP_EXPIRY_INTERVAL))
+        )
+    if settings.MEMBERSHIP_STATS_RECONCILE_INTERVAL > 0:
+        tasks.append(
+            asyncio.create_task(
+                run_stats_reconciler(settings.MEMBERSHIP_STATS_RECONCILE_INTERVAL)
+            )
+        )
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await dispose_engines()
+
+
+app = FastAPI(title="Fitness Center Management", lifespan=lifespan)
+if settings.REQUEST_METRICS_ENABLED:
+    app.add_middleware(RequestMetricsMiddleware)
 
 
 @app.get("/")
@@ -14,4 +87,12 @@ def root():
     return {"message": "Welcome to Fitness Center API"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(
+        http_metrics.render_prometheus(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
 app.include_router(api_router, prefix="/api/v1")
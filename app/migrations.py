@@ -0,0 +1,130 @@
+"""Schema upgrades for databases created by an older ``create_all``.
+
+``Base.metadata.create_all`` only creates missing tables, so indexes and
+columns added to existing models never reach a database that already has
+them. Each migration below is idempotent and recorded in
+``schema_migrations`` once applied; fresh databases simply record them as
+no-ops.
+"""
+import logging
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    MetaData,
+    String,
+    Table,
+    exists,
+    func,
+    insert,
+    inspect,
+    literal,
+    select,
+)
+from sqlalchemy.exc import DBAPIError
+
+from .models.member import Member
+from .models.membership_event import MembershipEvent
+
+logger = logging.getLogger(__name__)
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", String(64), primary_key=True),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+def _create_index(connection, table, name: str) -> None:
+    existing = {index["name"] for index in inspect(connection).get_indexes(table.name)}
+    if name not in existing:
+        next(index for index in table.indexes if index.name == name).create(connection)
+
+
+def add_members_status_end_index(connection) -> None:
+    _create_index(connection, Member.__table__, "ix_members_status_end")
+
+
+def add_members_version(connection) -> None:
+    existing = {column["name"] for column in inspect(connection).get_columns("members")}
+    if "version" not in existing:
+        connection.exec_driver_sql(
+            "ALTER TABLE members ADD COLUMN version INTEGER NOT NULL DEFAULT 1"
+        )
+
+
+def add_members_search_indexes(connection) -> None:
+    _create_index(connection, Member.__table__, "ix_members_start_id")
+    _create_index(connection, Member.__table__, "ix_members_end_id")
+
+
+def backfill_membership_events(connection) -> None:
+    # members that predate the event log get one "created" event carrying
+    # their current dates, so /history is never empty for them
+    events = MembershipEvent.__table__
+    connection.execute(
+        insert(events).from_select(
+            [
+                events.c.member_id,
+                events.c.event_type,
+                events.c.occurred_at,
+                events.c.membership_start,
+                events.c.membership_end,
+                events.c.details,
+            ],
+            select(
+                Member.id,
+                literal("created"),
+                func.coalesce(Member.created_at, Member.membership_start),
+                Member.membership_start,
+                Member.membership_end,
+                literal("Membership on record before history was kept"),
+            ).where(~exists().where(events.c.member_id == Member.id)),
+        )
+    )
+
+
+def add_members_last_renewed_at(connection) -> None:
+    existing = {column["name"] for column in inspect(connection).get_columns("members")}
+    if "last_renewed_at" not in existing:
+        column_type = Member.__table__.c.last_renewed_at.type.compile(
+            dialect=connection.dialect
+        )
+        connection.exec_driver_sql(
+            f"ALTER TABLE members ADD COLUMN last_renewed_at {column_type}"
+        )
+
+
+MIGRATIONS = [
+    ("0001_members_status_end_index", add_members_status_end_index),
+    ("0002_members_version", add_members_version),
+    ("0003_members_search_indexes", add_members_search_indexes),
+    ("0004_membership_events_backfill", backfill_membership_events),
+    ("0005_members_last_renewed_at", add_members_last_renewed_at),
+]
+
+
+def run_migrations(engine) -> None:
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        applied = set(connection.scalars(select(schema_migrations.c.version)))
+
+    for version, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        try:
+            with engine.begin() as connection:
+                migrate(connection)
+                connection.execute(schema_migrations.insert().values(version=version))
+        except DBAPIError:
+            # another worker may have applied it concurrently
+            with engine.connect() as connection:
+                done = connection.scalar(
+                    select(schema_migrations.c.version).where(
+                        schema_migrations.c.version == version
+                    )
+                )
+            if done is None:
+                raise
+        logger.info("applied migration %s", version)
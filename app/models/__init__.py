@@ -1,2 +1,4 @@
 from app.models.user import User
 from app.models.member import Member
+from app.models.membership_event import MembershipEvent
+from app.models.app_setting import AppSetting
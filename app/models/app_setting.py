@@ -0,0 +1,15 @@
+from sqlalchemy import Column, DateTime, String
+from sqlalchemy.sql import func
+from ..database import Base
+
+
+class AppSetting(Base):
+    """Values decided at runtime that every worker must agree on."""
+
+    __tablename__ = "app_settings"
+
+    key = Column(String(64), primary_key=True)
+    value = Column(String(255), nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
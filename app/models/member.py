@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -16,5 +16,20 @@ class Member(Base):
     membership_end = Column(DateTime(timezone=True), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # set by every renewal; repeats within RENEWAL_REPEAT_WINDOW_SECONDS of it
+    # are not applied again
+    last_renewed_at = Column(DateTime(timezone=True))
+    # bumped by every write; ORM updates check it, Core updates must bump it
+    version = Column(Integer, nullable=False, server_default="1")
 
     user = relationship("User", back_populates="member")
+
+    __mapper_args__ = {"version_id_col": version}
+
+    __table_args__ = (
+        # active-membership listing ordered by expiry, and the expiry sweep
+        Index("ix_members_status_end", "membership_status", "membership_end"),
+        # admin search keysets, see services.member_search
+        Index("ix_members_start_id", "membership_start", "id"),
+        Index("ix_members_end_id", "membership_end", "id"),
+    )
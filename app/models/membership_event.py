@@ -0,0 +1,25 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
+from sqlalchemy.orm import relationship
+from ..database import Base
+
+
+class MembershipEvent(Base):
+    """Append-only membership timeline; rows are never updated."""
+
+    __tablename__ = "membership_events"
+
+    id = Column(Integer, primary_key=True)
+    member_id = Column(
+        Integer, ForeignKey("members.id", ondelete="CASCADE"), nullable=False
+    )
+    event_type = Column(String(32), nullable=False)
+    occurred_at = Column(DateTime(timezone=True), nullable=False)
+    membership_start = Column(DateTime(timezone=True))
+    membership_end = Column(DateTime(timezone=True))
+    details = Column(String(255))
+
+    member = relationship("Member")
+
+    __table_args__ = (
+        Index("ix_membership_events_member_occurred", "member_id", "occurred_at"),
+    )
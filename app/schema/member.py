@@ -1,6 +1,8 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import Any, List, Optional, Union
+
+from .user import User
 
 
 class MemberBase(BaseModel):
@@ -22,6 +24,26 @@ class Member(MemberBase):
     user_id: int
     created_at: datetime
     updated_at: Optional[datetime]
+    version: int
 
     class Config:
         from_attributes = True
+
+
+class MemberWithUser(Member):
+    user: User
+
+
+class MemberSearchResult(Member):
+    email: str
+
+
+class MemberImportError(BaseModel):
+    row: int
+    detail: Union[str, List[Any]]
+
+
+class MemberImportResult(BaseModel):
+    created: int
+    updated: int
+    errors: List[MemberImportError]
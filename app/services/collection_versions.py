@@ -0,0 +1,92 @@
+"""Per-worker write counters for the listing ETags.
+
+A listing's ETag is derived from its collections' counters, so checking it
+costs no query, and a deleted-then-recreated row can never bring an old
+version back. Counters are bumped once a write has committed, never inside
+its transaction, so concurrent writers don't queue on a shared row.
+
+Counters are per process. Every version also carries the number of the
+current ``COLLECTION_VERSION_MAX_AGE`` window, so a write made through
+another worker shows up here, at the latest, when that window ends.
+
+ORM commits that touched members or users bump their counters through the
+session hooks below. Core INSERT/UPDATE statements (renewal, expiry,
+imports, password rehashes) bypass them and must call
+``collection_versions.bump`` after their commit.
+"""
+import itertools
+import threading
+import time
+from collections import Counter
+from typing import Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.member import Member
+from ..models.user import User
+
+MEMBERS = "members"
+USERS = "users"
+
+_CHANGED = "changed_collections"
+
+
+class CollectionVersions:
+    def __init__(self):
+        self._versions: Counter = Counter()
+        # stands in for the window number when windows are disabled, so a
+        # restarted worker doesn't hand out its predecessor's versions
+        self._started = int(time.time() * 1000)
+        self._lock = threading.Lock()
+
+    def bump(self, *names: str) -> None:
+        with self._lock:
+            self._versions.update(names)
+
+    def current(self, *names: str) -> Tuple[int, ...]:
+        max_age = settings.COLLECTION_VERSION_MAX_AGE
+        window = int(time.time() // max_age) if max_age > 0 else self._started
+        return (window, *(self._versions[name] for name in names))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._versions.clear()
+
+
+collection_versions = CollectionVersions()
+
+
+def _changed_collections(session: Session) -> set:
+    changed = {
+        type(obj)
+        for obj in itertools.chain(session.new, session.dirty, session.deleted)
+    }
+    names = set()
+    # deleting a user cascades to their membership in the database
+    if Member in changed or any(isinstance(obj, User) for obj in session.deleted):
+        names.add(MEMBERS)
+    if User in changed:
+        names.add(USERS)
+    return names
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_collections(session: Session, flush_context) -> None:
+    # new/dirty/deleted still hold what was just flushed
+    names = _changed_collections(session)
+    if names:
+        session.info.setdefault(_CHANGED, set()).update(names)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed_collections(session: Session) -> None:
+    names = session.info.pop(_CHANGED, None)
+    if names:
+        collection_versions.bump(*names)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_collections(session: Session) -> None:
+    session.info.pop(_CHANGED, None)
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..core.metrics import Histogram, register_collector
+from ..database import get_session_factory
+from ..models.member import Member
+from .collection_versions import MEMBERS, collection_versions
+from .membership_events import record_expired
+from .membership_stats import MemberState, membership_stats
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ExpiryRun:
+    rows: int
+    batches: int
+    duration: float
+
+
+class ExpiryStats:
+    def __init__(self):
+        self.runs = 0
+        self.rows = 0
+        self.failures = 0
+        self.last_run: Optional[dict] = None
+        self.duration = Histogram()
+        self._lock = threading.Lock()
+
+    def record(self, run: ExpiryRun) -> None:
+        self.duration.observe(run.duration)
+        with self._lock:
+            self.runs += 1
+            self.rows += run.rows
+            self.last_run = {
+                "rows": run.rows,
+                "batches": run.batches,
+                "duration_seconds": run.duration,
+                "finished_at": datetime.now().isoformat(),
+            }
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "rows": self.rows,
+                "failures": self.failures,
+                "last_run": self.last_run,
+                "duration_seconds": self.duration.snapshot(),
+            }
+
+
+expiry_stats = ExpiryStats()
+register_collector("membership_expiry", expiry_stats.snapshot)
+
+
+def _expired(now: datetime):
+    return (Member.membership_status == True, Member.membership_end < now)
+
+
+def expire_batch_statement(now: datetime, batch_size: int):
+    # the outer predicate is re-checked so rows another worker already
+    # expired are neither touched nor counted again
+    batch = select(Member.id).where(*_expired(now)).limit(batch_size)
+    return (
+        update(Member)
+        .where(*_expired(now), Member.id.in_(batch))
+        .values(membership_status=False, version=Member.version + 1)
+        .returning(Member.id, Member.membership_end)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def _expire_batch(db: AsyncSession, now: datetime, batch_size: int) -> list:
+    if db.get_bind().dialect.update_returning:
+        result = await db.execute(expire_batch_statement(now, batch_size))
+        return result.all()
+
+    # no UPDATE ... RETURNING (MySQL): lock the batch first; SKIP LOCKED
+    # lets concurrent workers take disjoint batches
+    expired = (
+        await db.execute(
+            select(Member.id, Member.membership_end)
+            .where(*_expired(now))
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+    ).all()
+    if expired:
+        await db.execute(
+            update(Member)
+            .where(Member.id.in_([member_id for member_id, _ in expired]))
+            .values(membership_status=False, version=Member.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+    return expired
+
+
+async def expire_memberships(
+    session_factory=None,
+    batch_size: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> ExpiryRun:
+    """Flip lapsed memberships to inactive in bounded, separately committed batches.
+
+    Each batch updates at most ``batch_size`` rows and appends their
+    ``expired`` events in the same transaction. Concurrent runs from several
+    workers only contend on row locks; they never expire a row twice.
+    """
+    session_factory = session_factory or get_session_factory()
+    batch_size = batch_size or settings.MEMBERSHIP_EXPIRY_BATCH_SIZE
+    now = now or datetime.now()
+    started = time.perf_counter()
+    rows = batches = 0
+
+    while True:
+        async with session_factory() as db:
+            expired = await _expire_batch(db, now, batch_size)
+            await record_expired(db, expired, occurred_at=now)
+            await db.commit()
+        if expired:
+            collection_versions.bump(MEMBERS)
+        for _, end in expired:
+            membership_stats.record_changed(
+                MemberState(True, end), MemberState(False, end)
+            )
+        batches += 1
+        rows += len(expired)
+        if len(expired) < batch_size:
+            break
+
+    run = ExpiryRun(rows=rows, batches=batches, duration=time.perf_counter() - started)
+    expiry_stats.record(run)
+    logger.info(
+        json.dumps(
+            {
+                "event": "membership_expiry",
+                "rows": run.rows,
+                "batches": run.batches,
+                "duration_seconds": round(run.duration, 6),
+            }
+        )
+    )
+    return run
+
+
+async def run_expiry_sweeper(interval: float) -> None:
+    while True:
+        try:
+            await expire_memberships()
+        except Exception:
+            expiry_stats.record_failure()
+            logger.exception("membership expiry sweep failed")
+        await asyncio.sleep(interval)
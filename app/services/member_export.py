@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator
+
+from sqlalchemy import select
+
+from ..core.config import settings
+from ..models.member import Member
+
+EXPORT_COLUMNS = (
+    Member.id,
+    Member.user_id,
+    Member.membership_status,
+    Member.membership_start,
+    Member.membership_end,
+    Member.created_at,
+    Member.updated_at,
+)
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _ndjson_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _encode_ndjson(rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(EXPORT_FIELDS, row)), default=_ndjson_default) + "\n"
+        for row in rows
+    )
+
+
+def _encode_csv(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        [value.isoformat() if isinstance(value, datetime) else value for value in row]
+        for row in rows
+    )
+    return buffer.getvalue()
+
+
+async def stream_members(session_factory, export_format: str) -> AsyncIterator[str]:
+    """Yield encoded members one fetch batch at a time.
+
+    Plain column tuples are streamed with ``yield_per`` (a server-side
+    cursor where the driver has one), so neither ORM identity maps nor the
+    full result set are held in memory.
+    """
+    encode = _encode_csv if export_format == "csv" else _encode_ndjson
+    if export_format == "csv":
+        yield ",".join(EXPORT_FIELDS) + "\r\n"
+
+    async with session_factory() as db:
+        result = await db.stream(
+            select(*EXPORT_COLUMNS)
+            .order_by(Member.id)
+            .execution_options(yield_per=settings.MEMBER_EXPORT_BATCH_SIZE)
+        )
+        async for rows in result.partitions():
+            yield encode(rows)
@@ -0,0 +1,137 @@
+from datetime import date, datetime
+from typing import Iterable, List
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..models.member import Member
+from ..models.user import User
+from ..schema.member import MemberCreate
+from .collection_versions import MEMBERS, collection_versions
+from .membership_events import record_imported
+from .membership_stats import MemberState, membership_stats
+
+UPSERT_COLUMNS = ("membership_status", "membership_start", "membership_end")
+UPSERT_DIALECTS = ("mysql", "sqlite", "postgresql")
+
+
+def member_upsert_statement(dialect_name: str):
+    table = Member.__table__
+    if dialect_name == "mysql":
+        statement = mysql.insert(table)
+        return statement.on_duplicate_key_update(
+            updated_at=func.now(),
+            version=table.c.version + 1,
+            **{column: statement.inserted[column] for column in UPSERT_COLUMNS},
+        )
+    if dialect_name in ("sqlite", "postgresql"):
+        dialect_insert = sqlite.insert if dialect_name == "sqlite" else postgresql.insert
+        statement = dialect_insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={
+                "updated_at": func.now(),
+                "version": table.c.version + 1,
+                **{column: statement.excluded[column] for column in UPSERT_COLUMNS},
+            },
+        )
+    raise NotImplementedError(f"member upsert is not supported on {dialect_name}")
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+async def import_members(
+    db: AsyncSession, rows: Iterable[dict], upsert: bool = False
+) -> dict:
+    """Validate and write many members, reporting failures per input row.
+
+    User existence and existing members are checked with one IN query each
+    per chunk, and each chunk is written with a single executemany INSERT
+    (or dialect upsert), plus one executemany INSERT of their history
+    events, and committed on its own.
+    """
+    dialect_name = db.get_bind().dialect.name
+    if upsert and dialect_name not in UPSERT_DIALECTS:
+        # checked before any row is written, so nothing is half-imported
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=f"upsert imports are not supported on {dialect_name}",
+        )
+    errors: List[dict] = []
+    valid = {}
+    for index, raw in enumerate(rows):
+        try:
+            member_in = MemberCreate.model_validate(raw)
+        except ValidationError as exc:
+            detail = [{"loc": e["loc"], "msg": e["msg"]} for e in exc.errors()]
+            errors.append({"row": index, "detail": detail})
+            continue
+        if member_in.user_id in valid:
+            errors.append({"row": index, "detail": "Duplicate user_id in import"})
+            continue
+        valid[member_in.user_id] = (index, member_in.model_dump())
+
+    created = updated = 0
+    statement = (
+        member_upsert_statement(dialect_name)
+        if upsert
+        else insert(Member.__table__)
+    )
+    for chunk in _chunks(list(valid.items()), settings.MEMBER_IMPORT_CHUNK_SIZE):
+        user_ids = [user_id for user_id, _ in chunk]
+        users = set(await db.scalars(select(User.id).where(User.id.in_(user_ids))))
+        existing = {
+            user_id: MemberState(status, end)
+            for user_id, status, end in await db.execute(
+                select(
+                    Member.user_id, Member.membership_status, Member.membership_end
+                ).where(Member.user_id.in_(user_ids))
+            )
+        }
+
+        batch, batch_rows, batch_updates = [], [], 0
+        for user_id, (index, data) in chunk:
+            if user_id not in users:
+                errors.append({"row": index, "detail": "User not found"})
+            elif user_id in existing and not upsert:
+                errors.append(
+                    {"row": index, "detail": "Member already exists for this user"}
+                )
+            else:
+                batch.append(data)
+                batch_rows.append(index)
+                batch_updates += user_id in existing
+        if not batch:
+            continue
+
+        try:
+            await db.execute(statement, batch)
+            await record_imported(db, batch, existing, datetime.now())
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            errors.extend(
+                {"row": index, "detail": "Conflicts with a concurrent write, retry"}
+                for index in batch_rows
+            )
+            continue
+        collection_versions.bump(MEMBERS)
+        created += len(batch) - batch_updates
+        updated += batch_updates
+        for data in batch:
+            state = MemberState(data["membership_status"], data["membership_end"])
+            if data["user_id"] in existing:
+                membership_stats.record_changed(existing[data["user_id"]], state)
+            else:
+                membership_stats.record_added(state, date.today())
+
+    errors.sort(key=lambda error: error["row"])
+    return {"created": created, "updated": updated, "errors": errors}
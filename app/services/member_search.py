@@ -0,0 +1,158 @@
+"""Admin member search: filters that are always answered from an index.
+
+Every search walks exactly one index in key order, keyset-paginated on
+``(sort key, member id)``. Each sort key lists the filters its index can
+serve; any other combination would mean a scan with residual filtering,
+so it is rejected instead of silently getting slow as the table grows.
+
+    sort    index                                 filters it serves
+    id      members primary key                   (none)
+    start   ix_members_start_id                   start_from, start_to
+    end     ix_members_end_id,                    end_from, end_to,
+            ix_members_status_end (with status)   status
+    email   ix_users_email                        email_prefix
+"""
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, tuple_
+
+from ..core.pagination import decode_cursor, encode_cursor
+from ..core.responses import schema_columns
+from ..models.member import Member
+from ..models.user import User
+from ..schema.member import Member as MemberSchema
+
+
+@dataclass(frozen=True)
+class MemberSearch:
+    email_prefix: Optional[str] = None
+    status: Optional[bool] = None
+    start_from: Optional[datetime] = None
+    start_to: Optional[datetime] = None
+    end_from: Optional[datetime] = None
+    end_to: Optional[datetime] = None
+
+    def used(self) -> Tuple[str, ...]:
+        return tuple(
+            field.name for field in fields(self) if getattr(self, field.name) is not None
+        )
+
+
+SORT_KEYS = {
+    "id": Member.id,
+    "start": Member.membership_start,
+    "end": Member.membership_end,
+    "email": User.email,
+}
+SORT_FILTERS: Dict[str, frozenset] = {
+    "id": frozenset(),
+    "start": frozenset({"start_from", "start_to"}),
+    "end": frozenset({"end_from", "end_to", "status"}),
+    "email": frozenset({"email_prefix"}),
+}
+DATETIME_SORTS = ("start", "end")
+
+
+def _bad_request(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def choose_sort(search: MemberSearch, sort: Optional[str]) -> Tuple[str, bool]:
+    """``(sort key, descending)`` for the request, or 400 if no index fits."""
+    used = set(search.used())
+    if sort is None:
+        # the narrowest index that serves every filter given
+        candidates = ("email", "end", "start") if used else ("id",)
+        key = next((key for key in candidates if used <= SORT_FILTERS[key]), None)
+        if key is None:
+            raise _bad_request(
+                f"Filters {', '.join(sorted(used))} can't be combined: "
+                "no single index serves them all"
+            )
+        return key, False
+
+    descending = sort.startswith("-")
+    key = sort.lstrip("-")
+    if key not in SORT_KEYS:
+        raise _bad_request(
+            f"Unknown sort {sort!r}, expected one of {', '.join(SORT_KEYS)}"
+        )
+    unindexed = used - SORT_FILTERS[key]
+    if unindexed:
+        raise _bad_request(
+            f"Filters {', '.join(sorted(unindexed))} can't use an index "
+            f"together with sort {key!r}"
+        )
+    return key, descending
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    # the smallest string greater than every string starting with prefix
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+# the member response fields plus the email the prefix filter matches on
+SEARCH_COLUMNS = schema_columns(MemberSchema, Member) + [User.email]
+
+
+def member_search_query(
+    search: MemberSearch,
+    sort: Optional[str],
+    limit: int,
+    cursor: Optional[str] = None,
+):
+    """The page query (``limit + 1`` rows) and the sort it was planned with."""
+    key, descending = choose_sort(search, sort)
+    sort_name = f"-{key}" if descending else key
+    column = SORT_KEYS[key]
+
+    query = select(*SEARCH_COLUMNS).select_from(Member).join(Member.user)
+    if search.email_prefix is not None:
+        # a range rather than LIKE, so every backend can seek ix_users_email
+        query = query.where(
+            User.email >= search.email_prefix,
+            User.email < _prefix_upper_bound(search.email_prefix),
+        )
+    if search.status is not None:
+        query = query.where(Member.membership_status == search.status)
+    if search.start_from is not None:
+        query = query.where(Member.membership_start >= search.start_from)
+    if search.start_to is not None:
+        query = query.where(Member.membership_start < search.start_to)
+    if search.end_from is not None:
+        query = query.where(Member.membership_end >= search.end_from)
+    if search.end_to is not None:
+        query = query.where(Member.membership_end < search.end_to)
+
+    keyset = (column,) if key == "id" else (column, Member.id)
+    if descending:
+        query = query.order_by(*(part.desc() for part in keyset))
+    else:
+        query = query.order_by(*keyset)
+    query = query.limit(limit + 1)
+
+    if cursor:
+        (cursor_sort,) = decode_cursor(cursor, ["sort"])
+        if cursor_sort != sort_name:
+            raise _bad_request("Cursor belongs to a different sort")
+        last = decode_cursor(
+            cursor,
+            ["key"] if key == "id" else ["key", "id"],
+            datetimes=["key"] if key in DATETIME_SORTS else (),
+        )
+        bound = tuple_(*keyset) if len(keyset) > 1 else keyset[0]
+        last = tuple_(*last) if len(last) > 1 else last[0]
+        query = query.where(bound < last if descending else bound > last)
+    return query, sort_name
+
+
+def next_search_cursor(sort: str, last) -> str:
+    """Cursor continuing after ``last``, the final row of the current page."""
+    key = sort.lstrip("-")
+    if key == "id":
+        return encode_cursor(sort=sort, key=last.id)
+    value = last.email if key == "email" else getattr(last, SORT_KEYS[key].key)
+    return encode_cursor(sort=sort, key=value, id=last.id)
@@ -0,0 +1,95 @@
+from datetime import datetime
+from typing import Container, Iterable, Optional
+
+from sqlalchemy import bindparam, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.member import Member
+from ..models.membership_event import MembershipEvent
+
+CREATED = "created"
+UPDATED = "updated"
+RENEWED = "renewed"
+EXPIRED = "expired"
+
+
+def record_event(
+    db: AsyncSession,
+    member,
+    event_type: str,
+    details: Optional[str] = None,
+    occurred_at: Optional[datetime] = None,
+) -> None:
+    """Queue an event on the session; it is flushed with the caller's commit.
+
+    ``member`` is a ``Member`` (possibly not yet flushed) or any row with
+    ``id``, ``membership_start`` and ``membership_end``, e.g. from RETURNING.
+    """
+    event = MembershipEvent(
+        event_type=event_type,
+        occurred_at=occurred_at or datetime.now(),
+        membership_start=member.membership_start,
+        membership_end=member.membership_end,
+        details=details,
+    )
+    if isinstance(member, Member):
+        event.member = member
+    else:
+        event.member_id = member.id
+    db.add(event)
+
+
+async def record_expired(
+    db: AsyncSession, expired: Iterable[tuple], occurred_at: datetime
+) -> None:
+    """Append one event per ``(member_id, membership_end)`` in one executemany."""
+    rows = [
+        {
+            "member_id": member_id,
+            "event_type": EXPIRED,
+            "occurred_at": occurred_at,
+            "membership_end": membership_end,
+            "details": "Membership expired",
+        }
+        for member_id, membership_end in expired
+    ]
+    if rows:
+        await db.execute(insert(MembershipEvent.__table__), rows)
+
+
+async def record_imported(
+    db: AsyncSession,
+    members: Iterable[dict],
+    existing: Container[int],
+    occurred_at: datetime,
+) -> None:
+    """Append one event per imported member row in one executemany.
+
+    Rows whose ``user_id`` is in ``existing`` were overwritten by an upsert
+    and get an ``updated`` event, the rest ``created``. Member ids are
+    looked up by ``user_id`` inside the INSERT, so no RETURNING is needed.
+    """
+    rows = [
+        {
+            "import_user_id": data["user_id"],
+            "event_type": UPDATED if data["user_id"] in existing else CREATED,
+            "occurred_at": occurred_at,
+            "membership_start": data["membership_start"],
+            "membership_end": data["membership_end"],
+            "details": (
+                "Membership updated by import"
+                if data["user_id"] in existing
+                else "Membership created by import"
+            ),
+        }
+        for data in members
+    ]
+    if rows:
+        member_id = (
+            select(Member.id)
+            .where(Member.user_id == bindparam("import_user_id"))
+            .scalar_subquery()
+        )
+        await db.execute(
+            insert(MembershipEvent.__table__).values(member_id=member_id), rows
+        )
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import func, select
+
+from ..core.config import settings
+from ..core.metrics import register_collector
+from ..database import get_session_factory
+from ..models.member import Member
+
+logger = logging.getLogger(__name__)
+
+EXPIRING_WINDOWS = (7, 30)
+
+
+class MemberState(NamedTuple):
+    status: bool
+    end: datetime
+
+    @classmethod
+    def of(cls, member) -> "MemberState":
+        return cls(bool(member.membership_status), member.membership_end)
+
+
+class MembershipStats:
+    """Member counts kept up to date by the write paths.
+
+    Active members are bucketed by the day their membership ends, so
+    "expiring within N days" is a sum over N buckets and the active total
+    only changes when a bucket falls into the past. Counters are per
+    process: writes made by other workers, and renewals whose previous
+    state was not returned by the UPDATE, are folded in by ``reset`` from
+    the periodic reconciliation.
+    """
+
+    def __init__(self, new_member_days: int = 30):
+        self.new_member_days = new_member_days
+        self.total = 0
+        self.active = 0
+        self._ends: Counter = Counter()
+        self._created: Counter = Counter()
+        self._today = date.today()
+        self.reconciliations = 0
+        self.last_reconciled: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.total = self.active = 0
+            self._ends.clear()
+            self._created.clear()
+            self._today = date.today()
+
+    def _roll(self, today: date) -> None:
+        if today == self._today:
+            return
+        for day in [day for day in self._ends if day < today]:
+            self.active -= self._ends.pop(day)
+        oldest = today - timedelta(days=self.new_member_days - 1)
+        for day in [day for day in self._created if day < oldest]:
+            del self._created[day]
+        self._today = today
+
+    def _add(self, state: MemberState) -> None:
+        if state.status and state.end.date() >= self._today:
+            self._ends[state.end.date()] += 1
+            self.active += 1
+
+    def _remove(self, state: MemberState) -> None:
+        day = state.end.date()
+        if state.status and self._ends.get(day, 0) > 0:
+            self._ends[day] -= 1
+            self.active -= 1
+
+    def record_added(self, state: MemberState, created: date) -> None:
+        with self._lock:
+            self._roll(date.today())
+            self._add(state)
+            self.total += 1
+            self._created[created] += 1
+
+    def record_changed(self, before: Optional[MemberState], after: MemberState) -> None:
+        """Account for an update; ``before=None`` when the old state is unknown."""
+        with self._lock:
+            self._roll(date.today())
+            if before is not None:
+                self._remove(before)
+            self._add(after)
+
+    def record_deleted(self, state: MemberState, created: date) -> None:
+        with self._lock:
+            self._roll(date.today())
+            self._remove(state)
+            self.total -= 1
+            if self._created.get(created, 0) > 0:
+                self._created[created] -= 1
+
+    def reset(self, total: int, ends: dict, created: dict) -> dict:
+        """Replace all counters with freshly aggregated ones, returning the drift."""
+        with self._lock:
+            self._today = date.today()
+            ends = {day: count for day, count in ends.items() if day >= self._today}
+            active = sum(ends.values())
+            drift = {"total": total - self.total, "active": active - self.active}
+            self.total = total
+            self.active = active
+            self._ends = Counter(ends)
+            self._created = Counter(created)
+            self.reconciliations += 1
+            self.last_reconciled = {
+                "at": datetime.now().isoformat(),
+                "drift": drift,
+            }
+            return drift
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._roll(date.today())
+            today = self._today
+            days = [today - timedelta(days=n) for n in range(self.new_member_days)]
+            return {
+                "total": self.total,
+                "active": self.active,
+                **{
+                    f"expiring_{window}_days": sum(
+                        self._ends.get(today + timedelta(days=n), 0)
+                        for n in range(window + 1)
+                    )
+                    for window in EXPIRING_WINDOWS
+                },
+                "new_members_per_day": {
+                    day.isoformat(): self._created.get(day, 0)
+                    for day in reversed(days)
+                },
+            }
+
+    def reconciliation_snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "reconciliations": self.reconciliations,
+                "last_reconciled": self.last_reconciled,
+            }
+
+
+membership_stats = MembershipStats(settings.MEMBERSHIP_STATS_NEW_MEMBER_DAYS)
+register_collector("membership_stats", membership_stats.reconciliation_snapshot)
+
+
+def _as_date(value) -> date:
+    # SQLite's date() returns text, the other backends a date
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+async def reconcile_membership_stats(session_factory=None) -> dict:
+    """Recount the stats from ``COUNT`` aggregates and replace the counters."""
+    session_factory = session_factory or get_session_factory()
+    today = date.today()
+    today_start = datetime.combine(today, datetime.min.time())
+    first_new_day = today_start - timedelta(days=membership_stats.new_member_days - 1)
+    end_day = func.date(Member.membership_end)
+    created_day = func.date(Member.created_at)
+    async with session_factory() as db:
+        total = await db.scalar(select(func.count(Member.id)))
+        ends = await db.execute(
+            select(end_day, func.count(Member.id))
+            .where(
+                Member.membership_status == True,
+                Member.membership_end >= today_start,
+            )
+            .group_by(end_day)
+        )
+        created = await db.execute(
+            select(created_day, func.count(Member.id))
+            .where(Member.created_at >= first_new_day)
+            .group_by(created_day)
+        )
+        drift = membership_stats.reset(
+            total,
+            {_as_date(day): count for day, count in ends},
+            {_as_date(day): count for day, count in created},
+        )
+    logger.info(json.dumps({"event": "membership_stats_reconciled", **drift}))
+    return drift
+
+
+async def run_stats_reconciler(interval: float) -> None:
+    while True:
+        try:
+            await reconcile_membership_stats()
+        except Exception:
+            logger.exception("membership stats reconciliation failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,121 @@
+"""Choosing the bcrypt cost once per deployment rather than once per worker.
+
+The first worker to start without ``BCRYPT_ROUNDS`` times bcrypt on its
+host, stores the chosen cost in ``app_settings`` and every later worker
+reuses it, so hashes don't flip between costs as workers on slightly
+different hosts come and go. Run this module to print the per-cost timing
+table, and with ``--store`` to recalibrate after moving to new hardware.
+"""
+import argparse
+import asyncio
+import json
+import logging
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from ..core.config import settings
+from ..core.integrity import UNIQUE_VIOLATION, constraint_violation
+from ..core.password_cost import calibrate, password_cost
+from ..database import get_session_factory
+from ..init_db import init_db
+from ..models.app_setting import AppSetting
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS_KEY = "bcrypt_rounds"
+
+
+async def stored_rounds(session_factory=None) -> Optional[int]:
+    session_factory = session_factory or get_session_factory()
+    async with session_factory() as db:
+        value = await db.scalar(
+            select(AppSetting.value).where(AppSetting.key == BCRYPT_ROUNDS_KEY)
+        )
+    return int(value) if value is not None else None
+
+
+async def store_rounds(rounds: int, session_factory=None, replace=False) -> int:
+    """Store ``rounds``, returning the cost in effect afterwards.
+
+    Without ``replace`` a cost stored first by a concurrently starting
+    worker wins, so all workers settle on one value.
+    """
+    session_factory = session_factory or get_session_factory()
+    async with session_factory() as db:
+        setting = await db.get(AppSetting, BCRYPT_ROUNDS_KEY) if replace else None
+        if setting is None:
+            db.add(AppSetting(key=BCRYPT_ROUNDS_KEY, value=str(rounds)))
+        else:
+            setting.value = str(rounds)
+        try:
+            await db.commit()
+        except IntegrityError as exc:
+            await db.rollback()
+            if constraint_violation(exc) != UNIQUE_VIOLATION:
+                raise
+            return await stored_rounds(session_factory)
+    return rounds
+
+
+async def configure_password_cost(session_factory=None) -> dict:
+    """Settle the cost new hashes use: configured, stored, or calibrated."""
+    if settings.BCRYPT_ROUNDS > 0:
+        password_cost.configure(settings.BCRYPT_ROUNDS, "configured")
+        return password_cost.snapshot()
+
+    rounds = await stored_rounds(session_factory)
+    if rounds is not None:
+        password_cost.configure(rounds, "stored")
+        return password_cost.snapshot()
+
+    rounds, medians = await asyncio.to_thread(
+        calibrate,
+        settings.BCRYPT_TARGET_SECONDS,
+        settings.BCRYPT_MIN_ROUNDS,
+        settings.BCRYPT_MAX_ROUNDS,
+    )
+    stored = await store_rounds(rounds, session_factory)
+    if stored == rounds:
+        password_cost.configure(rounds, "calibrated", medians)
+    else:
+        password_cost.configure(stored, "stored")
+    logger.info(
+        json.dumps(
+            {
+                "event": "bcrypt_calibrated",
+                "target_seconds": settings.BCRYPT_TARGET_SECONDS,
+                "rounds": password_cost.rounds,
+                "median_seconds": {
+                    str(cost): round(seconds, 6) for cost, seconds in medians.items()
+                },
+            }
+        )
+    )
+    return password_cost.snapshot()
+
+
+async def _main(args) -> None:
+    rounds, medians = await asyncio.to_thread(
+        calibrate, args.target, args.min_rounds, args.max_rounds, args.samples
+    )
+    for cost, seconds in sorted(medians.items()):
+        marker = "  <- chosen" if cost == rounds else ""
+        print(f"cost {cost:2d}: median {seconds * 1000:9.1f} ms{marker}")
+    if args.store:
+        await asyncio.to_thread(init_db)
+        await store_rounds(rounds, replace=True)
+        print(f"stored bcrypt cost {rounds}; restart workers to pick it up")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", type=float, default=settings.BCRYPT_TARGET_SECONDS)
+    parser.add_argument("--min-rounds", type=int, default=settings.BCRYPT_MIN_ROUNDS)
+    parser.add_argument("--max-rounds", type=int, default=settings.BCRYPT_MAX_ROUNDS)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument(
+        "--store", action="store_true", help="replace the stored cost with the result"
+    )
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,205 @@
+from datetime import datetime, timedelta
+from typing import Any, NamedTuple, Optional
+
+from sqlalchemy import DateTime, case, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from ..models.member import Member
+from .collection_versions import MEMBERS, collection_versions
+from .membership_events import RENEWED, record_event
+from .membership_stats import MemberState, membership_stats
+
+RENEWAL_DAYS = 30
+RENEWAL_COLUMNS = (
+    Member.id,
+    Member.membership_start,
+    Member.membership_end,
+    Member.version,
+)
+
+
+class add_days(FunctionElement):
+    """``add_days(datetime_expr, days)`` rendered per dialect."""
+
+    type = DateTime(timezone=True)
+    name = "add_days"
+    inherit_cache = True
+
+
+@compiles(add_days)
+def _add_days(element, compiler, **kw):
+    value, days = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"({value} + INTERVAL {days} DAY)"
+
+
+@compiles(add_days, "sqlite")
+def _add_days_sqlite(element, compiler, **kw):
+    value, days = (compiler.process(clause, **kw) for clause in element.clauses)
+    # keep the fractional seconds SQLAlchemy stores for DateTime columns
+    return f"strftime('%Y-%m-%d %H:%M:%f', {value}, {days} || ' days')"
+
+
+@compiles(add_days, "mysql")
+def _add_days_mysql(element, compiler, **kw):
+    value, days = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"DATE_ADD({value}, INTERVAL {days} DAY)"
+
+
+@compiles(add_days, "postgresql")
+def _add_days_postgresql(element, compiler, **kw):
+    value, days = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"({value} + make_interval(days => {days}))"
+
+
+def renew_statement(
+    user_id: int,
+    now: datetime,
+    expected_version: Optional[int] = None,
+    repeats_until: Optional[datetime] = None,
+):
+    """Extend from ``max(membership_end, now)`` in one conditional UPDATE.
+
+    With ``repeats_until`` the row only matches if it was last renewed at or
+    before that time; the condition is on the row itself, so a concurrent
+    renewal that commits first is seen once the row lock is released.
+    """
+    renewed_from = case(
+        (Member.membership_end > now, Member.membership_end), else_=now
+    )
+    statement = (
+        update(Member)
+        .where(Member.user_id == user_id)
+        .values(
+            membership_end=add_days(renewed_from, RENEWAL_DAYS),
+            membership_status=True,
+            last_renewed_at=now,
+            version=Member.version + 1,
+            updated_at=func.now(),
+        )
+        .returning(*RENEWAL_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    if expected_version is not None:
+        statement = statement.where(Member.version == expected_version)
+    if repeats_until is not None:
+        statement = statement.where(
+            or_(
+                Member.last_renewed_at.is_(None),
+                Member.last_renewed_at <= repeats_until,
+            )
+        )
+    return statement
+
+
+class Renewal(NamedTuple):
+    # the row as renewed: id, membership_start, membership_end, version
+    member: Any
+    # True when nothing was written because this repeated a recent renewal
+    repeated: bool = False
+
+
+RENEWED_DETAILS = f"Membership renewed for {RENEWAL_DAYS} days"
+
+
+async def renew_membership(
+    db: AsyncSession,
+    user_id: int,
+    expected_version: Optional[int] = None,
+    now: Optional[datetime] = None,
+    repeat_window: float = 0,
+) -> Optional[Renewal]:
+    """Renew a membership atomically; ``None`` when no row matched.
+
+    With ``expected_version`` the renewal only applies if nobody else has
+    written the member since that version was read, so a double-submitted
+    renewal is applied once. With ``repeat_window`` a renewal arriving within
+    that many seconds of the previous one is a repeat of it: nothing is
+    written and the membership is returned, marked ``repeated``, as the
+    previous renewal left it. With neither, concurrent renewals each extend
+    the end date and none is lost.
+    """
+    now = now or datetime.now()
+    repeats_until = None
+    if repeat_window > 0:
+        repeats_until = now - timedelta(seconds=repeat_window)
+    if db.get_bind().dialect.update_returning:
+        statement = renew_statement(user_id, now, expected_version, repeats_until)
+        # RETURNING only has the new row, so the prior status is told apart
+        # by matching active rows first; inactive ones (rare) take a second
+        # UPDATE
+        was_active = True
+        renewed = (
+            await db.execute(statement.where(Member.membership_status == True))
+        ).one_or_none()
+        if renewed is None:
+            was_active = False
+            renewed = (
+                await db.execute(statement.where(Member.membership_status.is_not(True)))
+            ).one_or_none()
+        if renewed is None:
+            if repeats_until is None:
+                return None
+            # either there is no membership, or it was renewed moments ago
+            current = (
+                await db.execute(
+                    select(*RENEWAL_COLUMNS).where(Member.user_id == user_id)
+                )
+            ).one_or_none()
+            return Renewal(current, repeated=True) if current is not None else None
+        # an active row's previous end is recoverable when it was still in
+        # the future; one that had lapsed was no longer counted as active
+        previous_end = renewed.membership_end - timedelta(days=RENEWAL_DAYS)
+        before = (
+            MemberState(True, previous_end)
+            if was_active and previous_end > now
+            else None
+        )
+    else:
+        renewed, before = await _renew_locked(
+            db, user_id, expected_version, now, repeats_until
+        )
+        if renewed is None:
+            return None
+        if before is None:
+            return Renewal(renewed, repeated=True)
+
+    record_event(db, renewed, RENEWED, details=RENEWED_DETAILS, occurred_at=now)
+    await db.commit()
+    collection_versions.bump(MEMBERS)
+    membership_stats.record_changed(before, MemberState(True, renewed.membership_end))
+    return Renewal(renewed)
+
+
+async def _renew_locked(
+    db: AsyncSession,
+    user_id: int,
+    expected_version: Optional[int],
+    now: datetime,
+    repeats_until: Optional[datetime],
+):
+    # no UPDATE ... RETURNING (MySQL): lock the row, compute, write back.
+    # Returns (member, state before) when renewed, (member, None) for a
+    # repeat and (None, None) when nothing matched
+    member = await db.scalar(
+        select(Member).where(Member.user_id == user_id).with_for_update()
+    )
+    if member is None or (
+        expected_version is not None and member.version != expected_version
+    ):
+        return None, None
+    if (
+        repeats_until is not None
+        and member.last_renewed_at is not None
+        and member.last_renewed_at > repeats_until
+    ):
+        return member, None
+    before = MemberState.of(member)
+    member.membership_end = max(member.membership_end, now) + timedelta(
+        days=RENEWAL_DAYS
+    )
+    member.membership_status = True
+    member.last_renewed_at = now
+    await db.flush()
+    return member, before
@@ -1,12 +1,34 @@
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.main import app
-from app.database import get_db
+from app.database import (
+    enable_sqlite_foreign_keys,
+    get_db,
+    get_session_factory,
+    instrument_queries,
+    replica_router,
+)
 from ..database import Base
-from app.core.security import create_access_token
+from app.core.security import (
+    create_access_token,
+    ip_rate_limiter,
+    principal_cache,
+    token_revocations,
+    user_rate_limiter,
+)
+from app.core.config import settings
+from app.core.request_metrics import http_metrics
+from app.services.membership_stats import membership_stats
+
 
+# query budgets and N+1 checks fail the request instead of logging
+settings.QUERY_BUDGET_STRICT = True
+# no window edges between a request and its conditional repeat
+settings.COLLECTION_VERSION_MAX_AGE = 0
 
 SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///./test_fitness_center.db"
 
@@ -15,6 +37,18 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# TestClient runs every request on a fresh event loop, so async connections
+# must not be pooled across requests
+async_engine = create_async_engine(
+    "sqlite+aiosqlite:///./test_fitness_center.db", poolclass=NullPool
+)
+enable_sqlite_foreign_keys(engine)
+enable_sqlite_foreign_keys(async_engine)
+instrument_queries(async_engine)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 
 @pytest.fixture
 def db():
@@ -27,13 +61,24 @@ def db():
         Base.metadata.drop_all(bind=engine)
 
 
+@pytest.fixture
+def async_session_factory(db):
+    return TestingAsyncSessionLocal
+
+
 @pytest.fixture
 def client(db):
-    def override_get_db():
-        try:
-            yield db
-        finally:
-            db.close()
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as session:
+            yield session
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: TestingAsyncSessionLocal
+    principal_cache.clear()
+    token_revocations.clear()
+    ip_rate_limiter.clear()
+    user_rate_limiter.clear()
+    membership_stats.clear()
+    replica_router.clear()
+    http_metrics.clear()
     return TestClient(app)
@@ -1,5 +1,24 @@
+import asyncio
+import threading
+import time
+
 import pytest
-from app.core.security import get_password_hash
+from jose import jwt
+from app.core import password_cost as password_cost_module
+from app.core import rate_limit
+from app.core.config import settings
+from app.core.executor import BoundedExecutor, ExecutorSaturated
+from app.core.password_cost import calibrate, hash_cost, password_cost
+from app.core.rate_limit import TokenBucketLimiter
+from app.core.security import (
+    ALGORITHM,
+    SECRET_KEY,
+    get_password_hash,
+    password_hasher,
+    principal_cache,
+)
+from app.models import User
+from app.services.password_cost import configure_password_cost
 
 
 @pytest.mark.auth
@@ -101,3 +120,222 @@ class TestAuth:
 
         no_token_response = client.get("/api/v1/auth/me")
         assert no_token_response.status_code == 401
+
+    def test_login_rejected_when_hasher_saturated(self, client, monkeypatch):
+        signup_response = client.post(
+            "/api/v1/auth/signup",
+            json={"email": "test@example.com", "password": "StrongPass123"},
+        )
+        assert signup_response.status_code == 201
+
+        monkeypatch.setattr(password_hasher, "capacity", 0)
+        response = client.post(
+            "/api/v1/auth/login",
+            data={"username": "test@example.com", "password": "StrongPass123"},
+        )
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+    def test_cancelled_caller_keeps_slot_until_job_finishes(self):
+        executor = BoundedExecutor("test", workers=1, max_queue=0)
+        release = threading.Event()
+
+        async def scenario():
+            waiter = asyncio.create_task(executor.run(release.wait))
+            await asyncio.sleep(0.05)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            # the job is still running on its thread, so there is no room
+            assert executor.in_flight == 1
+            with pytest.raises(ExecutorSaturated):
+                await executor.run(lambda: None)
+            release.set()
+            await asyncio.sleep(0.05)
+            assert executor.in_flight == 0
+            assert await executor.run(lambda: "done") == "done"
+
+        asyncio.run(scenario())
+
+    def test_login_rate_limited_before_hashing(self, client, monkeypatch):
+        client.post(
+            "/api/v1/auth/signup",
+            json={"email": "test@example.com", "password": "StrongPass123"},
+        )
+        wrong = {"username": "test@example.com", "password": "WrongPass123"}
+        for _ in range(settings.AUTH_RATE_LIMIT_USER_BURST):
+            assert client.post("/api/v1/auth/login", data=wrong).status_code == 401
+
+        # a saturated hasher would answer 503; the limiter must answer first
+        monkeypatch.setattr(password_hasher, "capacity", 0)
+        response = client.post(
+            "/api/v1/auth/login", data={**wrong, "username": "TEST@example.com "}
+        )
+        assert response.status_code == 429
+        per_token = 60 / settings.AUTH_RATE_LIMIT_USER_PER_MINUTE
+        assert 0 < int(response.headers["Retry-After"]) <= per_token
+
+        # other usernames from the same address are still within the IP budget
+        response = client.post(
+            "/api/v1/auth/login",
+            data={"username": "other@example.com", "password": "StrongPass123"},
+        )
+        assert response.status_code == 401
+
+    def test_token_bucket_limiter(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+        limiter = TokenBucketLimiter(burst=2, rate=0.5, maxsize=2)
+
+        assert limiter.acquire("a") == 0 and limiter.acquire("a") == 0
+        assert limiter.acquire("a") == pytest.approx(2.0)
+        now[0] += 1
+        assert limiter.acquire("a") == pytest.approx(1.0)
+        now[0] += 1
+        assert limiter.acquire("a") == 0
+
+        # bounded: the least recently seen key is dropped
+        limiter.acquire("b")
+        limiter.acquire("c")
+        assert len(limiter) == 2 and limiter.evictions == 1
+        assert limiter.acquire("a") == 0
+        assert limiter.snapshot()["rejected"] == 2
+
+    def test_login_rehashes_at_current_cost(self, client, db, monkeypatch):
+        credentials = {"username": "test@example.com", "password": "StrongPass123"}
+        monkeypatch.setattr(password_cost, "rounds", 4)
+        client.post(
+            "/api/v1/auth/signup",
+            json={"email": credentials["username"], "password": "StrongPass123"},
+        )
+        user = db.query(User).filter(User.email == credentials["username"]).one()
+        assert hash_cost(user.hashed_password) == 4
+
+        monkeypatch.setattr(password_cost, "rounds", 5)
+        rehashes = password_cost.rehashes
+        assert client.post("/api/v1/auth/login", data=credentials).status_code == 200
+        db.refresh(user)
+        assert hash_cost(user.hashed_password) == 5
+        assert password_cost.rehashes == rehashes + 1
+
+        # the new hash verifies, and is already at the current cost
+        assert client.post("/api/v1/auth/login", data=credentials).status_code == 200
+        assert password_cost.rehashes == rehashes + 1
+        verify = password_cost.snapshot()["verify_seconds"]
+        assert verify["4"]["count"] >= 1 and verify["5"]["count"] >= 1
+
+    def test_calibrate_picks_highest_cost_within_target(self, monkeypatch):
+        timed = []
+
+        def fake_time_hash(rounds, samples):
+            timed.append(rounds)
+            return [0.01 * 2 ** (rounds - 10)] * samples
+
+        monkeypatch.setattr(password_cost_module, "time_hash", fake_time_hash)
+        rounds, medians = calibrate(0.05, 10, 15)
+        assert rounds == 12
+        # 13 would take 0.08s, so it is never timed
+        assert timed == [10, 11, 12]
+        assert medians[12] == pytest.approx(0.04)
+
+        assert calibrate(0.001, 10, 15)[0] == 10
+        assert calibrate(100, 10, 15)[0] == 15
+
+    def test_calibrated_cost_is_stored_for_other_workers(
+        self, async_session_factory, monkeypatch
+    ):
+        monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 0)
+        monkeypatch.setattr(settings, "BCRYPT_MIN_ROUNDS", 4)
+        monkeypatch.setattr(settings, "BCRYPT_MAX_ROUNDS", 5)
+        monkeypatch.setattr(password_cost, "rounds", password_cost.rounds)
+        monkeypatch.setattr(password_cost, "source", password_cost.source)
+
+        first = asyncio.run(configure_password_cost(async_session_factory))
+        assert first["source"] == "calibrated" and first["rounds"] in (4, 5)
+
+        second = asyncio.run(configure_password_cost(async_session_factory))
+        assert second["source"] == "stored" and second["rounds"] == first["rounds"]
+
+        monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 6)
+        pinned = asyncio.run(configure_password_cost(async_session_factory))
+        assert pinned["source"] == "configured" and pinned["rounds"] == 6
+
+    def test_principal_cache_evicted_on_deactivation(self, client, db):
+        client.post(
+            "/api/v1/auth/signup",
+            json={"email": "test@example.com", "password": "StrongPass123"},
+        )
+        login_response = client.post(
+            "/api/v1/auth/login",
+            data={"username": "test@example.com", "password": "StrongPass123"},
+        )
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+        hits = principal_cache.hits
+        assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+        assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+        assert principal_cache.hits == hits + 1
+
+        user = db.query(User).filter(User.email == "test@example.com").first()
+        user.is_active = False
+        db.commit()
+
+        response = client.get("/api/v1/", headers=headers)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Inactive user"
+
+    def test_claims_token_revoked_on_deactivation(self, client, db, monkeypatch):
+        monkeypatch.setattr(settings, "JWT_EMBED_CLAIMS", True)
+        client.post(
+            "/api/v1/auth/signup",
+            json={"email": "test@example.com", "password": "StrongPass123"},
+        )
+        login_response = client.post(
+            "/api/v1/auth/login",
+            data={"username": "test@example.com", "password": "StrongPass123"},
+        )
+        token = login_response.json()["access_token"]
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        assert claims["act"] is True and claims["adm"] is False
+        headers = {"Authorization": f"Bearer {token}"}
+
+        response = client.get("/api/v1/members", headers=headers)
+        assert response.status_code == 403
+
+        user = db.query(User).filter(User.email == "test@example.com").first()
+        user.is_active = False
+        db.commit()
+
+        response = client.get("/api/v1/members", headers=headers)
+        assert response.status_code == 401
+
+    def test_relogin_in_same_second_as_revocation(self, client, db, monkeypatch):
+        monkeypatch.setattr(settings, "JWT_EMBED_CLAIMS", True)
+        credentials = {"username": "test@example.com", "password": "StrongPass123"}
+        client.post(
+            "/api/v1/auth/signup",
+            json={"email": credentials["username"], "password": "StrongPass123"},
+        )
+        old_token = client.post("/api/v1/auth/login", data=credentials).json()[
+            "access_token"
+        ]
+
+        # from here on a clock that stays within one second but keeps moving
+        second = int(time.time()) + 1
+        ticks = iter(range(1, 1000))
+        monkeypatch.setattr(time, "time", lambda: second + next(ticks) / 1000)
+        user = db.query(User).filter(User.email == credentials["username"]).one()
+        user.is_admin = True
+        db.commit()
+        new_token = client.post("/api/v1/auth/login", data=credentials).json()[
+            "access_token"
+        ]
+
+        response = client.get(
+            "/api/v1/members", headers={"Authorization": f"Bearer {new_token}"}
+        )
+        assert response.status_code == 200
+        response = client.get(
+            "/api/v1/members", headers={"Authorization": f"Bearer {old_token}"}
+        )
+        assert response.status_code == 401
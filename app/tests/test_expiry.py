@@ -0,0 +1,36 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app.models import Member, MembershipEvent, User
+from app.services.expiry import expire_memberships
+
+
+def test_expire_memberships_in_batches(db, async_session_factory):
+    now = datetime.now()
+    ends = [now - timedelta(days=3), now - timedelta(days=1), now + timedelta(days=5)]
+    for i, end in enumerate(ends):
+        user = User(email=f"member{i}@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        db.add(
+            Member(
+                user_id=user.id,
+                membership_status=True,
+                membership_start=now - timedelta(days=30),
+                membership_end=end,
+            )
+        )
+    db.commit()
+
+    run = asyncio.run(expire_memberships(async_session_factory, batch_size=1))
+    assert run.rows == 2
+    assert run.batches == 3
+
+    db.expire_all()
+    statuses = [m.membership_status for m in db.query(Member).order_by(Member.id)]
+    assert statuses == [False, False, True]
+    events = db.query(MembershipEvent).filter_by(event_type="expired").all()
+    assert sorted(event.member_id for event in events) == [1, 2]
+
+    rerun = asyncio.run(expire_memberships(async_session_factory, batch_size=1))
+    assert rerun.rows == 0
@@ -1,8 +1,28 @@
+import asyncio
+import csv
+import io
+import json
+import logging
 import pytest
 from datetime import datetime, timedelta
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from app.models import User
+from app.api.v1 import admin
+from app.models import Member, MembershipEvent, User
+from app.core.config import settings
+from app.core.pagination import encode_cursor
+from app.core.request_metrics import (
+    QueryBudgetExceeded,
+    RequestQueries,
+    check_query_budget,
+)
+from app.core.responses import orjson
 from app.core.security import get_password_hash
+from app.database import parameters_shape
+from app.services import collection_versions as collection_versions_module
+from app.services import member_import
+from app.services.collection_versions import MEMBERS, USERS, collection_versions
+from app.services.membership_stats import reconcile_membership_stats
 
 
 @pytest.mark.member
@@ -65,6 +85,27 @@ class TestMember:
         assert "created_at" in data
         assert "updated_at" in data
 
+    def test_create_member_conflicts(
+        self, client, auth_headers, sample_member_data
+    ):
+        response = client.post(
+            "/api/v1/members/",
+            json={**sample_member_data, "user_id": 9999},
+            headers=auth_headers,
+        )
+        assert response.status_code == 404
+        assert response.json()["detail"] == "User not found"
+
+        response = client.post(
+            "/api/v1/members/", json=sample_member_data, headers=auth_headers
+        )
+        assert response.status_code == 201
+        response = client.post(
+            "/api/v1/members/", json=sample_member_data, headers=auth_headers
+        )
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Member already exists for this user"
+
     def test_get_all_members(self, client, auth_headers, sample_member_data):
         create_response = client.post(
             "/api/v1/members/", json=sample_member_data, headers=auth_headers
@@ -101,3 +142,513 @@ class TestMember:
 
         response = client.delete(f"/api/v1/members/{member_id}", headers=auth_headers)
         assert response.status_code == 204
+
+    def test_runtime_metrics(self, client, auth_headers):
+        response = client.get("/api/v1/admin/metrics", headers=auth_headers)
+        assert response.status_code == 200
+        pool = response.json()["db_pool"]
+        assert {"checked_out", "overflow", "waits", "timeouts"} <= pool.keys()
+        assert "+Inf" in pool["checkout_latency_seconds"]["buckets"]
+        json_responses = response.json()["json_responses"]
+        assert json_responses["encoder"] == ("orjson" if orjson else "json")
+
+    @pytest.fixture
+    def many_members(self, db: Session):
+        now = datetime.now()
+        for i in range(5):
+            user = User(email=f"member{i}@example.com", hashed_password="x")
+            db.add(user)
+            db.flush()
+            db.add(
+                Member(
+                    user_id=user.id,
+                    membership_status=True,
+                    membership_start=now,
+                    # reverse order so expiry order differs from id order
+                    membership_end=now + timedelta(days=10 - i),
+                )
+            )
+        db.commit()
+
+    @pytest.mark.parametrize("path", ["/api/v1/members", "/api/v1/memberships"])
+    def test_cursor_pagination(self, client, auth_headers, many_members, path):
+        seen = []
+        params = {"limit": 2}
+        while True:
+            response = client.get(path, params=params, headers=auth_headers)
+            assert response.status_code == 200
+            seen.extend(member["id"] for member in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+            params = {"limit": 2, "cursor": cursor}
+
+        assert len(seen) == len(set(seen)) == 5
+
+    @pytest.mark.parametrize("path", ["/api/v1/members", "/api/v1/memberships"])
+    @pytest.mark.parametrize("params", [{"limit": 0}, {"limit": -1}, {"skip": -1}])
+    def test_page_bounds(self, client, auth_headers, many_members, path, params):
+        response = client.get(path, params=params, headers=auth_headers)
+        assert response.status_code == 422
+        too_large = {"limit": settings.MAX_PAGE_SIZE + 1}
+        response = client.get(path, params=too_large, headers=auth_headers)
+        assert response.status_code == 422
+
+    def search_all(self, client, auth_headers, **params):
+        rows, pages = [], 0
+        while True:
+            response = client.get(
+                "/api/v1/members/search", params=params, headers=auth_headers
+            )
+            assert response.status_code == 200, response.text
+            rows.extend(response.json())
+            pages += 1
+            params["cursor"] = response.headers.get("X-Next-Cursor")
+            if params["cursor"] is None:
+                return rows, pages
+
+    def test_search_members(self, client, auth_headers, many_members, monkeypatch):
+        rows, pages = self.search_all(
+            client, auth_headers, email_prefix="member", limit=2
+        )
+        assert [row["email"] for row in rows] == [
+            f"member{i}@example.com" for i in range(5)
+        ]
+        assert pages == 3
+
+        rows, _ = self.search_all(client, auth_headers, email_prefix="member3")
+        assert [row["email"] for row in rows] == ["member3@example.com"]
+
+        # latest expiry first: member0 was given the longest membership
+        rows, pages = self.search_all(
+            client, auth_headers, status=True, sort="-end", limit=2
+        )
+        assert [row["email"] for row in rows] == [
+            f"member{i}@example.com" for i in range(5)
+        ]
+        ends = [row["membership_end"] for row in rows]
+        assert ends == sorted(ends, reverse=True)
+
+        cutoff = rows[2]["membership_end"]
+        rows, _ = self.search_all(client, auth_headers, end_to=cutoff)
+        assert [row["email"] for row in rows] == [
+            "member4@example.com",
+            "member3@example.com",
+        ]
+
+        monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", True)
+        fast, _ = self.search_all(client, auth_headers, end_to=cutoff)
+        assert [row["email"] for row in fast] == [row["email"] for row in rows]
+
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {"email_prefix": "member", "end_from": "2030-01-01T00:00:00"},
+            {"status": True, "start_from": "2030-01-01T00:00:00"},
+            {"status": True, "sort": "id"},
+            {"email_prefix": "member", "sort": "-end"},
+            {"sort": "name"},
+            {"sort": "end", "cursor": encode_cursor(sort="id", key=1)},
+        ],
+    )
+    def test_search_rejects_unindexed_combinations(
+        self, client, auth_headers, params
+    ):
+        response = client.get(
+            "/api/v1/members/search", params=params, headers=auth_headers
+        )
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize("limit", [0, -1, settings.MAX_PAGE_SIZE + 1])
+    def test_search_page_bounds(self, client, auth_headers, many_members, limit):
+        response = client.get(
+            "/api/v1/members/search", params={"limit": limit}, headers=auth_headers
+        )
+        assert response.status_code == 422
+
+    def test_invalid_cursor(self, client, auth_headers):
+        response = client.get(
+            "/api/v1/members", params={"cursor": "not-a-cursor"}, headers=auth_headers
+        )
+        assert response.status_code == 400
+
+    def test_bulk_import_members(
+        self, client, db, auth_headers, user_id, monkeypatch
+    ):
+        other = User(email="other@example.com", hashed_password="x")
+        db.add(other)
+        db.commit()
+        start = datetime.now().isoformat()
+        end = (datetime.now() + timedelta(days=30)).isoformat()
+        row = {"membership_status": True, "membership_start": start, "membership_end": end}
+        rows = [
+            {**row, "user_id": user_id},
+            {**row, "user_id": user_id},
+            {**row, "user_id": 9999},
+            {"user_id": other.id, "membership_status": True},
+            {**row, "user_id": other.id},
+        ]
+
+        response = client.post("/api/v1/members/bulk", json=rows, headers=auth_headers)
+        assert response.status_code == 200
+        result = response.json()
+        assert result["created"] == 2
+        assert result["updated"] == 0
+        assert [error["row"] for error in result["errors"]] == [1, 2, 3]
+        assert result["errors"][1]["detail"] == "User not found"
+
+        response = client.post(
+            "/api/v1/members/bulk", json=rows[:1], headers=auth_headers
+        )
+        assert response.json()["errors"][0]["detail"] == (
+            "Member already exists for this user"
+        )
+
+        rows[0]["membership_status"] = False
+        response = client.post(
+            "/api/v1/members/bulk",
+            params={"upsert": True},
+            json=rows[:1],
+            headers=auth_headers,
+        )
+        assert response.json() == {"created": 0, "updated": 1, "errors": []}
+        members = client.get("/api/v1/members", headers=auth_headers).json()
+        assert [m["membership_status"] for m in members] == [False, True]
+
+        monkeypatch.setattr(member_import, "UPSERT_DIALECTS", ("postgresql",))
+        response = client.post(
+            "/api/v1/members/bulk",
+            params={"upsert": True},
+            json=rows[:1],
+            headers=auth_headers,
+        )
+        assert response.status_code == 501
+
+        # every imported row, including the overwrite, is in the history
+        events = db.query(MembershipEvent).order_by(MembershipEvent.id).all()
+        assert [(e.member_id, e.event_type) for e in events] == [
+            (members[0]["id"], "created"),
+            (members[1]["id"], "created"),
+            (members[0]["id"], "updated"),
+        ]
+
+    def test_bulk_import_members_csv(self, client, auth_headers, user_id):
+        start = datetime.now().isoformat()
+        end = (datetime.now() + timedelta(days=30)).isoformat()
+        body = (
+            "user_id,membership_status,membership_start,membership_end\n"
+            f"{user_id},true,{start},{end}\n"
+            f"9999,true,{start},{end}\n"
+        )
+        response = client.post(
+            "/api/v1/members/bulk/csv",
+            files={"file": ("members.csv", body, "text/csv")},
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        result = response.json()
+        assert result["created"] == 1
+        assert result["errors"] == [{"row": 1, "detail": "User not found"}]
+
+    @pytest.mark.parametrize("path", ["/api/v1/members", "/api/v1/memberships"])
+    def test_fast_json_responses(
+        self, client, auth_headers, many_members, monkeypatch, path
+    ):
+        params = {"limit": 2}
+        expected = client.get(path, params=params, headers=auth_headers)
+
+        monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", True)
+        response = client.get(path, params=params, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json() == expected.json()
+        assert response.headers["X-Next-Cursor"] == expected.headers["X-Next-Cursor"]
+        assert response.headers["ETag"] == expected.headers["ETag"]
+
+    @pytest.mark.parametrize("path", ["/api/v1/members", "/api/v1/memberships"])
+    def test_include_user_single_query(
+        self, client, auth_headers, many_members, async_session_factory, path
+    ):
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = async_session_factory.kw["bind"].sync_engine
+        # resolves and caches the admin principal, so only listing SQL is counted
+        client.get(path, headers=auth_headers)
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            pages = {}
+            for limit in (1, 2, 6):
+                statements.clear()
+                response = client.get(
+                    path,
+                    params={"include": "user", "limit": limit},
+                    headers=auth_headers,
+                )
+                assert response.status_code == 200
+                pages[limit] = response.json()
+                # one joined page query, whatever the size
+                assert len(statements) == 1, statements
+                assert "JOIN users" in statements[-1]
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+        rows = pages[6]
+        assert len(rows) == 5
+        for row in rows:
+            assert row["user"]["id"] == row["user_id"]
+            assert "hashed_password" not in row["user"]
+        assert {row["user"]["email"] for row in rows} == {
+            f"member{i}@example.com" for i in range(5)
+        }
+
+        flat = client.get(path, params={"limit": 6}, headers=auth_headers)
+        assert "user" not in flat.json()[0]
+        assert flat.headers["ETag"] != response.headers["ETag"]
+
+        response = client.get(path, params={"include": "payments"}, headers=auth_headers)
+        assert response.status_code == 422
+
+    def test_members_list_not_modified(
+        self, client, auth_headers, many_members, sample_member_data
+    ):
+        response = client.get("/api/v1/members", headers=auth_headers)
+        etag = response.headers["ETag"]
+        conditional = {**auth_headers, "If-None-Match": etag}
+
+        response = client.get("/api/v1/members", headers=conditional)
+        assert response.status_code == 304
+        assert response.content == b""
+
+        response = client.get(
+            "/api/v1/members", params={"limit": 2}, headers=conditional
+        )
+        assert response.status_code == 200
+
+        client.put("/api/v1/members/1", json=sample_member_data, headers=auth_headers)
+        response = client.get("/api/v1/members", headers=conditional)
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_members_etag_survives_id_reuse(self, client, db, auth_headers, user_id):
+        start = datetime.now()
+        data = {
+            "user_id": user_id,
+            "membership_status": True,
+            "membership_start": start.isoformat(),
+            "membership_end": (start + timedelta(days=30)).isoformat(),
+        }
+        created = client.post("/api/v1/members", json=data, headers=auth_headers)
+        member_id = created.json()["id"]
+        etag = client.get("/api/v1/members", headers=auth_headers).headers["ETag"]
+        conditional = {**auth_headers, "If-None-Match": etag}
+
+        client.delete(f"/api/v1/members/{member_id}", headers=auth_headers)
+        other = User(email="other@example.com", hashed_password="x")
+        db.add(other)
+        db.commit()
+        # SQLite hands the freed highest id to the next member
+        recreated = client.post(
+            "/api/v1/members",
+            json={**data, "user_id": other.id, "membership_status": False},
+            headers=auth_headers,
+        )
+        assert recreated.json()["id"] == member_id
+
+        response = client.get("/api/v1/members", headers=conditional)
+        assert response.status_code == 200
+        assert response.json()[-1]["membership_status"] is False
+
+    def test_collection_versions_bump_on_commit_only(self, db):
+        before = collection_versions.current(MEMBERS, USERS)
+        db.add(User(email="rolled-back@example.com", hashed_password="x"))
+        db.flush()
+        db.rollback()
+        assert collection_versions.current(MEMBERS, USERS) == before
+
+        db.add(User(email="committed@example.com", hashed_password="x"))
+        db.commit()
+        window, members, users = collection_versions.current(MEMBERS, USERS)
+        assert (window, members, users) == (before[0], before[1], before[2] + 1)
+
+    def test_collection_version_window(self, monkeypatch):
+        # another worker's writes are only seen when the window moves on
+        monkeypatch.setattr(settings, "COLLECTION_VERSION_MAX_AGE", 5)
+        now = iter([1004.9, 1005.0])
+        monkeypatch.setattr(collection_versions_module.time, "time", lambda: next(now))
+        assert collection_versions.current(MEMBERS) != collection_versions.current(
+            MEMBERS
+        )
+
+    def test_export_members(self, client, auth_headers, many_members):
+        response = client.get(
+            "/api/v1/members/export", params={"format": "ndjson"}, headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["id"] for row in rows] == [1, 2, 3, 4, 5]
+        assert rows[0]["user_id"] and rows[0]["membership_end"]
+
+        response = client.get(
+            "/api/v1/members/export", params={"format": "csv"}, headers=auth_headers
+        )
+        assert response.status_code == 200
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert len(rows) == 5
+        assert rows[0].keys() >= {"id", "user_id", "membership_status"}
+
+    def test_membership_history_timeline(
+        self, client, auth_headers, sample_member_data
+    ):
+        response = client.post(
+            "/api/v1/members", json=sample_member_data, headers=auth_headers
+        )
+        assert response.status_code == 201
+        first = client.post("/api/v1/renew", headers=auth_headers)
+        assert first.status_code == 200
+        # a double click is answered with the first renewal, not applied again
+        repeat = client.post("/api/v1/renew", headers=auth_headers)
+        assert repeat.status_code == 200
+        assert first.json()["repeated"] is False
+        assert repeat.json()["repeated"] is True
+        assert repeat.json()["new_end_date"] == first.json()["new_end_date"]
+        assert repeat.json()["version"] == first.json()["version"]
+        stacked = client.post(
+            "/api/v1/renew", params={"stack": True}, headers=auth_headers
+        )
+        assert stacked.json()["version"] == first.json()["version"] + 1
+
+        response = client.get(
+            "/api/v1/history", params={"limit": 2}, headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert [e["event_type"] for e in response.json()] == ["renewed", "renewed"]
+
+        response = client.get(
+            "/api/v1/history",
+            params={"limit": 2, "cursor": response.headers["X-Next-Cursor"]},
+            headers=auth_headers,
+        )
+        assert [e["event_type"] for e in response.json()] == ["created"]
+        assert "X-Next-Cursor" not in response.headers
+
+        for limit in (0, -1, settings.MAX_PAGE_SIZE + 1):
+            response = client.get(
+                "/api/v1/history", params={"limit": limit}, headers=auth_headers
+            )
+            assert response.status_code == 422
+
+    def test_membership_stats(
+        self,
+        client,
+        auth_headers,
+        many_members,
+        sample_member_data,
+        async_session_factory,
+    ):
+        drift = asyncio.run(reconcile_membership_stats(async_session_factory))
+        assert drift == {"total": 5, "active": 5}
+        stats = client.get("/api/v1/admin/members/stats", headers=auth_headers).json()
+        assert stats["total"] == 5
+        assert stats["active"] == 5
+        assert stats["expiring_7_days"] == 2
+        assert stats["expiring_30_days"] == 5
+
+        created = client.post(
+            "/api/v1/members", json=sample_member_data, headers=auth_headers
+        )
+        assert created.status_code == 201
+        assert client.post("/api/v1/renew", headers=auth_headers).status_code == 200
+        member = client.put(
+            "/api/v1/members/1",
+            json={**sample_member_data, "membership_status": False},
+            headers=auth_headers,
+        )
+        assert member.status_code == 200
+        assert client.delete("/api/v1/members/2", headers=auth_headers).status_code == 204
+
+        stats = client.get("/api/v1/admin/members/stats", headers=auth_headers).json()
+        assert stats["total"] == 5
+        assert stats["active"] == 4
+        assert stats["expiring_30_days"] == 3
+        assert sum(stats["new_members_per_day"].values()) == 5
+
+        drift = asyncio.run(reconcile_membership_stats(async_session_factory))
+        assert drift == {"total": 0, "active": 0}
+        reconciled = client.get(
+            "/api/v1/admin/members/stats", headers=auth_headers
+        ).json()
+        assert reconciled == stats
+
+    def test_prometheus_request_metrics(self, client, auth_headers, many_members):
+        assert client.get("/api/v1/members", headers=auth_headers).status_code == 200
+        assert client.get("/api/v1/nowhere").status_code == 404
+        response = client.delete("/api/v1/members/999", headers=auth_headers)
+        assert response.status_code == 404
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        lines = response.text.splitlines()
+        labels = 'method="GET",route="/api/v1/members"'
+        assert f'http_requests_total{{{labels},status="200"}} 1' in lines
+        unmatched = 'method="GET",route="<unmatched>",status="404"'
+        assert f"http_requests_total{{{unmatched}}} 1" in lines
+        templated = 'method="DELETE",route="/api/v1/members/{member_id}",status="404"'
+        assert f"http_requests_total{{{templated}}} 1" in lines
+        # principal lookup and the page itself
+        queries = f"http_request_db_queries_sum{{{labels}}}"
+        assert any(
+            line.startswith(queries) and float(line.split()[-1]) >= 2
+            for line in lines
+        )
+        assert f"http_request_duration_seconds_count{{{labels}}} 1" in lines
+
+    def test_query_budget(self, client, auth_headers, many_members, monkeypatch):
+        assert client.get("/api/v1/members", headers=auth_headers).status_code == 200
+
+        monkeypatch.setattr(admin.get_all_members, "query_budget", 0)
+        with pytest.raises(QueryBudgetExceeded, match="query_budget_exceeded"):
+            client.get("/api/v1/members", headers=auth_headers)
+
+        scope = {"method": "GET", "path": "/api/v1/members", "endpoint": None}
+        queries = RequestQueries(scope)
+        for _ in range(settings.QUERY_REPEAT_THRESHOLD):
+            queries.record("SELECT * FROM members WHERE id = ?", 0.001)
+        with pytest.raises(QueryBudgetExceeded, match="probable_n_plus_one"):
+            check_query_budget(scope, queries)
+
+        # chunked imports opt out of repeat detection
+        scope["endpoint"] = admin.bulk_import_members
+        check_query_budget(scope, queries)
+
+    def test_slow_query_log(
+        self, client, auth_headers, many_members, monkeypatch, caplog
+    ):
+        monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD", 1e-9)
+        with caplog.at_level(logging.WARNING, logger="app.database"):
+            response = client.get("/api/v1/members?limit=2", headers=auth_headers)
+        assert response.status_code == 200
+
+        entries = [
+            json.loads(record.getMessage())
+            for record in caplog.records
+            if record.name == "app.database"
+        ]
+        page = next(entry for entry in entries if "LIMIT" in entry["statement"])
+        assert page["event"] == "slow_query"
+        assert page["method"] == "GET"
+        assert page["route"] == "/api/v1/members"
+        assert page["duration_seconds"] > 0
+        # parameter types only, never the values
+        assert page["parameters"] and set(page["parameters"]) == {"int"}
+
+    def test_parameters_shape(self):
+        assert parameters_shape(("a@example.com", 3)) == ["str", "int"]
+        assert parameters_shape({"email": "a@example.com"}) == {"email": "str"}
+        assert parameters_shape([(1, True), (2, False)], executemany=True) == {
+            "rows": 2,
+            "row": ["int", "bool"],
+        }
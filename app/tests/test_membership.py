@@ -1,11 +1,12 @@
 import pytest
 from datetime import datetime, timedelta
 from fastapi.testclient import TestClient
-from unittest.mock import Mock
+from unittest.mock import AsyncMock, Mock
 
 from app.database import get_db
 from ..models import User as UserModel
 from ..models import Member as MemberModel
+from ..models import MembershipEvent
 from ..api.deps import get_current_active_user
 
 
@@ -23,15 +24,42 @@ def mock_member(mock_user):
         membership_start=datetime.now(),
         membership_end=datetime.now() + timedelta(days=30),
         created_at=datetime.now(),
+        version=1,
     )
 
 
 @pytest.fixture
-def mock_db(mock_member):
+def mock_events(mock_member):
+    return [
+        MembershipEvent(
+            id=2,
+            member_id=mock_member.id,
+            event_type="renewed",
+            occurred_at=datetime.now(),
+            membership_end=mock_member.membership_end,
+            details="Membership renewed for 30 days",
+        ),
+        MembershipEvent(
+            id=1,
+            member_id=mock_member.id,
+            event_type="created",
+            occurred_at=datetime.now() - timedelta(days=30),
+            membership_end=mock_member.membership_end - timedelta(days=30),
+            details="Membership created",
+        ),
+    ]
+
+
+@pytest.fixture
+def mock_db(mock_member, mock_events):
     db = Mock()
-    mock_query = Mock()
-    mock_query.filter.return_value.first.return_value = mock_member
-    db.query.return_value = mock_query
+    db.scalar = AsyncMock(return_value=mock_member)
+    db.scalars = AsyncMock(return_value=Mock(all=Mock(return_value=mock_events)))
+    db.execute = AsyncMock(
+        return_value=Mock(one_or_none=Mock(return_value=mock_member))
+    )
+    db.commit = AsyncMock()
+    db.refresh = AsyncMock()
     return db
 
 
@@ -75,6 +103,22 @@ def test_get_membership_status(client_with_auth):
     assert isinstance(data["user_id"], int)
 
 
+def test_get_membership_status_not_modified(client_with_auth, mock_member):
+    response = client_with_auth.get("/api/v1/")
+    etag = response.headers["ETag"]
+    assert etag == '"member-1-1"'
+
+    response = client_with_auth.get("/api/v1/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    mock_member.version = 2
+    response = client_with_auth.get("/api/v1/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"member-1-2"'
+
+
 def test_renew_membership(client_with_auth):
     response = client_with_auth.post("/api/v1/renew")
     assert response.status_code == 200
@@ -95,11 +139,12 @@ def test_get_membership_history(client_with_auth):
     data = response.json()
 
     assert isinstance(data, list)
+    assert len(data) == 2
     for event in data:
         assert "event_type" in event
         assert "date" in event
         assert "details" in event
-        assert event["event_type"] in ["membership_start", "membership_end"]
+        assert event["event_type"] in ["created", "updated", "renewed", "expired"]
 
         try:
             datetime.fromisoformat(event["date"])
@@ -108,7 +153,7 @@ def test_get_membership_history(client_with_auth):
 
 
 def test_get_membership_status_not_found(client_with_auth, mock_db):
-    mock_db.query.return_value.filter.return_value.first.return_value = None
+    mock_db.scalar.return_value = None
 
     response = client_with_auth.get("/api/v1/")
     assert response.status_code == 404
@@ -117,7 +162,8 @@ def test_get_membership_status_not_found(client_with_auth, mock_db):
 
 
 def test_renew_membership_not_found(client_with_auth, mock_db):
-    mock_db.query.return_value.filter.return_value.first.return_value = None
+    mock_db.execute.return_value.one_or_none.return_value = None
+    mock_db.scalar.return_value = None
 
     response = client_with_auth.post("/api/v1/renew")
     assert response.status_code == 404
@@ -0,0 +1,141 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Member, MembershipEvent, User
+from app.services.membership_stats import membership_stats, reconcile_membership_stats
+from app.services.renewal import renew_membership
+
+
+@pytest.fixture
+def member_factory(db):
+    def create(end: datetime) -> Member:
+        user = User(email="renew@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        member = Member(
+            user_id=user.id,
+            membership_status=True,
+            membership_start=end - timedelta(days=30),
+            membership_end=end,
+        )
+        db.add(member)
+        db.commit()
+        return member
+
+    return create
+
+
+def renew_concurrently(
+    session_factory, user_id, times, expected_version=None, repeat_window=0
+):
+    async def renew_once():
+        async with session_factory() as session:
+            return await renew_membership(
+                session, user_id, expected_version, repeat_window=repeat_window
+            )
+
+    async def renew_all():
+        return await asyncio.gather(*(renew_once() for _ in range(times)))
+
+    return asyncio.run(renew_all())
+
+
+def test_parallel_renewals_are_not_lost(db, async_session_factory, member_factory):
+    end = datetime.now() + timedelta(days=10)
+    member = member_factory(end)
+
+    results = renew_concurrently(async_session_factory, member.user_id, times=5)
+    assert all(result is not None for result in results)
+
+    db.expire_all()
+    member = db.get(Member, member.id)
+    assert abs(member.membership_end - (end + timedelta(days=150))) < timedelta(
+        seconds=1
+    )
+    assert member.version == 6
+    assert db.query(MembershipEvent).filter_by(event_type="renewed").count() == 5
+
+
+def test_parallel_renewals_of_one_version_apply_once(
+    db, async_session_factory, member_factory
+):
+    end = datetime.now() + timedelta(days=10)
+    member = member_factory(end)
+
+    results = renew_concurrently(
+        async_session_factory, member.user_id, times=5, expected_version=1
+    )
+    assert sum(result is not None for result in results) == 1
+
+    db.expire_all()
+    member = db.get(Member, member.id)
+    assert abs(member.membership_end - (end + timedelta(days=30))) < timedelta(
+        seconds=1
+    )
+    assert member.version == 2
+
+
+def test_repeated_renewals_without_version_apply_once(
+    db, async_session_factory, member_factory
+):
+    end = datetime.now() + timedelta(days=10)
+    member = member_factory(end)
+
+    results = renew_concurrently(
+        async_session_factory, member.user_id, times=5, repeat_window=30
+    )
+    # every caller sees the one renewal that was applied
+    assert {
+        (result.member.membership_end, result.member.version) for result in results
+    } == {(results[0].member.membership_end, 2)}
+    # and all but the caller that applied it are told it was a repeat
+    assert sorted(result.repeated for result in results) == [False] + [True] * 4
+
+    db.expire_all()
+    member = db.get(Member, member.id)
+    assert abs(member.membership_end - (end + timedelta(days=30))) < timedelta(
+        seconds=1
+    )
+    assert member.version == 2
+    assert db.query(MembershipEvent).filter_by(event_type="renewed").count() == 1
+
+    # once the window has passed the next renewal extends again
+    async def renew_later():
+        async with async_session_factory() as session:
+            return await renew_membership(
+                session,
+                member.user_id,
+                now=datetime.now() + timedelta(minutes=1),
+                repeat_window=30,
+            )
+
+    assert asyncio.run(renew_later()).member.version == 3
+
+
+def test_lapsed_membership_renews_from_now(db, async_session_factory, member_factory):
+    member = member_factory(datetime.now() - timedelta(days=5))
+
+    (renewed,) = renew_concurrently(async_session_factory, member.user_id, times=1)
+    expected = datetime.now() + timedelta(days=30)
+    assert abs(renewed.member.membership_end - expected) < timedelta(seconds=5)
+    assert renewed.member.version == 2
+
+
+def test_renewing_inactive_member_counts_it_active_once(
+    db, async_session_factory, member_factory
+):
+    member = member_factory(datetime.now() + timedelta(days=10))
+    member.membership_status = False
+    db.commit()
+    asyncio.run(reconcile_membership_stats(async_session_factory))
+    assert membership_stats.active == 0
+
+    (renewed,) = renew_concurrently(async_session_factory, member.user_id, times=1)
+    assert renewed is not None
+    db.expire_all()
+    assert db.get(Member, member.id).membership_status is True
+    assert membership_stats.active == 1
+    drift = asyncio.run(reconcile_membership_stats(async_session_factory))
+    assert drift == {"total": 0, "active": 0}
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.security import get_password_hash
+from app.database import Base, get_replica_session_factory, replica_router
+from app.main import app
+from app.models import Member, User
+
+PASSWORD = "StrongPass123"
+
+
+def replica_factory(path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    return async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture
+def empty_replica(tmp_path):
+    # a second SQLite file with the schema but none of the primary's rows,
+    # so a response shows which database served it
+    path = tmp_path / "replica.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    app.dependency_overrides[get_replica_session_factory] = lambda: replica_factory(
+        path
+    )
+    yield path
+    app.dependency_overrides.pop(get_replica_session_factory, None)
+
+
+@pytest.fixture
+def admin_headers(client, db):
+    admin = User(
+        email="admin@example.com",
+        hashed_password=get_password_hash(PASSWORD),
+        is_admin=True,
+    )
+    db.add(admin)
+    db.flush()
+    db.add(
+        Member(
+            user_id=admin.id,
+            membership_status=True,
+            membership_start=datetime.now(),
+            membership_end=datetime.now() + timedelta(days=30),
+        )
+    )
+    db.commit()
+    response = client.post(
+        "/api/v1/auth/login", data={"username": admin.email, "password": PASSWORD}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_reads_routed_to_replica_until_own_write(client, admin_headers, empty_replica):
+    assert client.get("/api/v1/members", headers=admin_headers).json() == []
+    assert client.get("/api/v1/memberships", headers=admin_headers).json() == []
+    assert replica_router.snapshot()["replica_reads"] == 2
+
+    update = {
+        "membership_status": True,
+        "membership_start": datetime.now().isoformat(),
+        "membership_end": (datetime.now() + timedelta(days=60)).isoformat(),
+    }
+    response = client.put("/api/v1/members/1", json=update, headers=admin_headers)
+    assert response.status_code == 200
+
+    # read-your-writes: the writer now reads from the primary
+    members = client.get("/api/v1/members", headers=admin_headers).json()
+    assert [m["version"] for m in members] == [2]
+    assert client.get("/api/v1/", headers=admin_headers).json()["version"] == 2
+
+    replica_router.recent_writers.clear()
+    assert client.get("/api/v1/members", headers=admin_headers).json() == []
+
+
+def test_new_account_reads_itself_from_primary(client, db, empty_replica):
+    email = "new@example.com"
+    response = client.post(
+        "/api/v1/auth/signup", json={"email": email, "password": PASSWORD}
+    )
+    assert response.status_code == 201
+    token = client.post(
+        "/api/v1/auth/login", data={"username": email, "password": PASSWORD}
+    ).json()["access_token"]
+
+    response = client.get(
+        "/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert response.json()["email"] == email
+
+
+def test_unavailable_replica_falls_back_to_primary(client, admin_headers, tmp_path):
+    missing = tmp_path / "missing" / "replica.db"
+    app.dependency_overrides[get_replica_session_factory] = lambda: replica_factory(
+        missing
+    )
+    try:
+        for _ in range(2):
+            response = client.get("/api/v1/members", headers=admin_headers)
+            assert response.status_code == 200
+            assert len(response.json()) == 1
+    finally:
+        app.dependency_overrides.pop(get_replica_session_factory, None)
+
+    stats = replica_router.snapshot()
+    # the first failure takes the replica out of rotation for a while
+    assert stats["fallbacks"] == 1
+    assert stats["primary_reads"] == 1
+    assert stats["available"] is False
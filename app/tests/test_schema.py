@@ -0,0 +1,104 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import inspect
+
+from app.api.v1.admin import members_page_query, membership_records_query
+from app.core.pagination import encode_cursor
+from app.migrations import run_migrations, schema_migrations
+from app.models import Member, MembershipEvent, User
+from app.services.expiry import expire_batch_statement
+from app.services.member_search import MemberSearch, member_search_query
+
+
+def query_plan(db, query):
+    bind = db.get_bind()
+    sql = query.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True})
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")
+    return [row[-1] for row in rows]
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        members_page_query(100, cursor=encode_cursor(id=50)),
+        membership_records_query(100),
+        membership_records_query(
+            100, cursor=encode_cursor(end=datetime.now(), id=50)
+        ),
+        expire_batch_statement(datetime.now(), 500),
+        member_search_query(
+            MemberSearch(email_prefix="ab"),
+            None,
+            100,
+            cursor=encode_cursor(sort="email", key="abc@example.com", id=50),
+        )[0],
+        member_search_query(
+            MemberSearch(status=True, end_from=datetime.now()), "-end", 100
+        )[0],
+        member_search_query(
+            MemberSearch(end_from=datetime.now(), end_to=datetime.now()), None, 100
+        )[0],
+        member_search_query(MemberSearch(start_from=datetime.now()), None, 100)[0],
+    ],
+    ids=[
+        "members-cursor",
+        "memberships-first-page",
+        "memberships-cursor",
+        "expiry-batch",
+        "search-email-prefix",
+        "search-status-end",
+        "search-end-range",
+        "search-start-range",
+    ],
+)
+def test_hot_admin_queries_use_indexes(db, query):
+    plan = query_plan(db, query)
+    assert not [step for step in plan if step.startswith("SCAN")], plan
+    assert not [step for step in plan if "TEMP B-TREE" in step], plan
+
+
+def test_migrations_add_missing_indexes(db):
+    bind = db.get_bind()
+    index = next(
+        index
+        for index in Member.__table__.indexes
+        if index.name == "ix_members_status_end"
+    )
+    index.drop(bind)
+    schema_migrations.drop(bind, checkfirst=True)
+
+    run_migrations(bind)
+    run_migrations(bind)
+
+    names = {index["name"] for index in inspect(bind).get_indexes("members")}
+    assert "ix_members_status_end" in names
+    schema_migrations.drop(bind)
+
+
+def test_migrations_backfill_membership_events(db):
+    start = datetime(2024, 1, 1)
+    for i in range(2):
+        user = User(email=f"legacy{i}@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        db.add(
+            Member(
+                user_id=user.id,
+                membership_start=start,
+                membership_end=start + timedelta(days=30 * (i + 1)),
+            )
+        )
+    db.commit()
+    bind = db.get_bind()
+    schema_migrations.drop(bind, checkfirst=True)
+
+    run_migrations(bind)
+    schema_migrations.drop(bind)
+    run_migrations(bind)
+
+    events = db.query(MembershipEvent).order_by(MembershipEvent.member_id).all()
+    assert [(e.event_type, e.membership_end) for e in events] == [
+        ("created", start + timedelta(days=30)),
+        ("created", start + timedelta(days=60)),
+    ]
+    schema_migrations.drop(bind)
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def run_python(code: str, database_url: str) -> str:
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "MEMBERSHIP_EXPIRY_INTERVAL": "0",
+        "MEMBERSHIP_STATS_RECONCILE_INTERVAL": "0",
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+def test_import_does_not_touch_the_database():
+    # the directory does not exist, so any connection attempt would fail
+    output = run_python(
+        "import app.main, app.database as d; print(d._engine, d._async_engine)",
+        "sqlite:////nonexistent/fitness.db",
+    )
+    assert output == "None None"
+
+
+def test_lifespan_initialises_and_warms_the_database(tmp_path):
+    database = tmp_path / "startup.db"
+    output = run_python(
+        "from fastapi.testclient import TestClient\n"
+        "from sqlalchemy import inspect\n"
+        "from app.main import app\n"
+        "from app.database import get_async_engine, get_engine\n"
+        "with TestClient(app) as client:\n"
+        "    assert client.get('/').status_code == 200\n"
+        "    pool = get_async_engine().sync_engine.pool\n"
+        "    cache = get_async_engine().sync_engine._compiled_cache\n"
+        "    print(pool.checkedin(), len(cache) > 0)\n"
+        "print(sorted(inspect(get_engine()).get_table_names()))\n",
+        f"sqlite:///{database}",
+    )
+    warm, tables = output.splitlines()[-2:]
+    assert warm == "5 True"
+    assert "members" in tables and "schema_migrations" in tables
@@ -0,0 +1,134 @@
+"""Overhead benchmark for the request metrics middleware and cursor hooks.
+
+The same app is driven with and without instrumentation: "off" uses a
+plain engine and no middleware, "on" wraps the app in
+``RequestMetricsMiddleware`` and uses an engine with ``instrument_queries``.
+Requests are sequential so the difference is per-request CPU cost, and the
+variants alternate in rounds so drift affects both equally.
+
+    python -m benchmarks.bench_request_metrics --requests 2000 --rounds 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_request_metrics.sqlite")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+# the benchmark adds the middleware itself for the "on" variant
+os.environ["REQUEST_METRICS_ENABLED"] = "false"
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from app.api.deps import get_current_admin_user  # noqa: E402
+from app.core.request_metrics import RequestMetricsMiddleware, http_metrics  # noqa: E402
+from app.database import (  # noqa: E402
+    SQLALCHEMY_DATABASE_URL,
+    Base,
+    get_async_database_url,
+    get_db,
+    get_engine,
+    instrument_queries,
+)
+from app.main import app  # noqa: E402
+from app.models import Member as MemberModel, User as UserModel  # noqa: E402
+
+PATHS = ("/", "/api/v1/members?limit=20")
+
+
+def seed(members: int) -> None:
+    engine = get_engine()
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(UserModel),
+            [
+                {"email": f"bench{i}@example.com", "hashed_password": "x"}
+                for i in range(members)
+            ],
+        )
+        conn.execute(
+            insert(MemberModel),
+            [
+                {
+                    "user_id": i + 1,
+                    "membership_status": True,
+                    "membership_start": now,
+                    "membership_end": now + timedelta(days=30),
+                }
+                for i in range(members)
+            ],
+        )
+
+
+def session_override(instrumented: bool):
+    engine = create_async_engine(get_async_database_url(SQLALCHEMY_DATABASE_URL))
+    if instrumented:
+        instrument_queries(engine)
+    factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def override_get_db():
+        async with factory() as db:
+            yield db
+
+    return override_get_db
+
+
+async def drive(target, path: str, requests: int) -> list:
+    latencies = []
+    transport = httpx.ASGITransport(app=target)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+    return latencies
+
+
+async def main(args) -> None:
+    seed(args.members)
+    app.dependency_overrides[get_current_admin_user] = lambda: None
+    variants = {
+        "off": (app, session_override(instrumented=False)),
+        "on": (RequestMetricsMiddleware(app), session_override(instrumented=True)),
+    }
+
+    print(f"requests={args.requests} x rounds={args.rounds} (sequential)")
+    print(f"{'path':<28}{'variant':<8}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}")
+    for path in PATHS:
+        results = {name: [] for name in variants}
+        for _ in range(args.rounds):
+            for name, (target, override) in variants.items():
+                app.dependency_overrides[get_db] = override
+                results[name].extend(await drive(target, path, args.requests))
+        for name, latencies in results.items():
+            latencies.sort()
+            print(
+                f"{path:<28}{name:<8}"
+                f"{statistics.mean(latencies) * 1e6:>10.1f}"
+                f"{statistics.median(latencies) * 1e6:>10.1f}"
+                f"{latencies[int(len(latencies) * 0.99) - 1] * 1e6:>10.1f}"
+            )
+        overhead = statistics.mean(results["on"]) - statistics.mean(results["off"])
+        share = overhead / statistics.mean(results["off"]) * 100
+        print(f"{path:<28}{'delta':<8}{overhead * 1e6:>10.1f}{share:>9.1f}%")
+    http_metrics.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
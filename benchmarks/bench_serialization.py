@@ -0,0 +1,126 @@
+"""Serialization microbenchmark: response_model path vs the fast JSON path.
+
+Both variants turn the same page of members into response bytes. The
+default variant mirrors what FastAPI does for ``response_model=List[Member]``
+(ORM objects validated ``from_attributes``, dumped to JSON-able data, then
+``json.dumps``); the fast variant selects ``schema_columns`` as plain rows and
+renders them with ``rows_response``. Fetch and encode are timed
+separately, reported per 1k rows.
+
+    python -m benchmarks.bench_serialization --rows 1000 --repeat 50
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import create_engine, insert, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.core import responses  # noqa: E402
+from app.core.responses import rows_response, schema_columns  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.models import Member as MemberModel, User as UserModel  # noqa: E402
+from app.schema.member import Member  # noqa: E402
+
+MEMBER_COLUMNS = schema_columns(Member, MemberModel)
+members_adapter = TypeAdapter(List[Member])
+
+
+def seed(engine, rows: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(UserModel),
+            [
+                {"email": f"bench{i}@example.com", "hashed_password": "x"}
+                for i in range(rows)
+            ],
+        )
+        conn.execute(
+            insert(MemberModel),
+            [
+                {
+                    "user_id": i + 1,
+                    "membership_status": True,
+                    "membership_start": now,
+                    "membership_end": now + timedelta(days=30),
+                    "updated_at": now,
+                }
+                for i in range(rows)
+            ],
+        )
+
+
+def default_path(session: Session, rows: int):
+    started = time.perf_counter()
+    members = session.scalars(select(MemberModel).limit(rows)).all()
+    fetched = time.perf_counter()
+    validated = members_adapter.validate_python(members, from_attributes=True)
+    body = json.dumps(
+        members_adapter.dump_python(validated, mode="json"),
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    done = time.perf_counter()
+    session.expunge_all()
+    return fetched - started, done - fetched, body
+
+
+def fast_path(session: Session, rows: int):
+    started = time.perf_counter()
+    members = session.execute(select(*MEMBER_COLUMNS).limit(rows)).all()
+    fetched = time.perf_counter()
+    body = rows_response(members).body
+    done = time.perf_counter()
+    return fetched - started, done - fetched, body
+
+
+def run(variant, session: Session, rows: int, repeat: int) -> dict:
+    fetch, encode = [], []
+    for _ in range(repeat):
+        fetch_time, encode_time, body = variant(session, rows)
+        fetch.append(fetch_time)
+        encode.append(encode_time)
+    per_1k = 1000 / rows * 1000
+    return {
+        "fetch_ms": statistics.median(fetch) * per_1k,
+        "encode_ms": statistics.median(encode) * per_1k,
+        "bytes": len(body),
+    }
+
+
+def main(args) -> None:
+    engine = create_engine("sqlite://")
+    seed(engine, args.rows)
+    variants = {"default": default_path, "fast": fast_path}
+    if responses.orjson is None:
+        print("orjson not installed: fast variant renders with the json module")
+
+    print(f"rows={args.rows} repeat={args.repeat} (medians, ms per 1k rows)")
+    print(f"{'variant':<10}{'fetch':>10}{'encode':>10}{'total':>10}{'bytes':>10}")
+    with Session(engine) as session:
+        for name, variant in variants.items():
+            result = run(variant, session, args.rows, args.repeat)
+            total = result["fetch_ms"] + result["encode_ms"]
+            print(
+                f"{name:<10}{result['fetch_ms']:>10.2f}{result['encode_ms']:>10.2f}"
+                f"{total:>10.2f}{result['bytes']:>10}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,142 @@
+"""Startup benchmark: import time and time-to-first-request.
+
+Each sample is a fresh interpreter that imports ``app.main``, runs the
+lifespan startup, then serves two admin member listings over ASGI. The
+"cold" variant disables pool warm-up and statement precompilation, the
+"warm" variant uses the defaults, so the difference shows what startup
+takes off the first request.
+
+    python -m benchmarks.bench_startup --samples 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_startup.sqlite")
+ENV = {
+    "DATABASE_URL": f"sqlite:///{DB_PATH}",
+    "SECRET_KEY": "bench",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "MEMBERSHIP_EXPIRY_INTERVAL": "0",
+    "MEMBERSHIP_STATS_RECONCILE_INTERVAL": "0",
+    # keep the one-off bcrypt calibration out of the cold/warm comparison
+    "BCRYPT_ROUNDS": "12",
+}
+VARIANTS = {
+    "cold": {"DB_POOL_WARMUP": "0", "DB_PRECOMPILE_ON_STARTUP": "false"},
+    "warm": {},
+}
+
+
+def seed(members: int) -> None:
+    os.environ.update(ENV)
+    from sqlalchemy import insert
+
+    from app.database import Base, get_engine
+    from app.init_db import init_db
+    from app.models import Member as MemberModel, User as UserModel
+
+    engine = get_engine()
+    Base.metadata.drop_all(bind=engine)
+    init_db()
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(
+            insert(UserModel),
+            [
+                {"email": f"bench{i}@example.com", "hashed_password": "x"}
+                for i in range(members)
+            ],
+        )
+        conn.execute(
+            insert(MemberModel),
+            [
+                {
+                    "user_id": i + 1,
+                    "membership_status": True,
+                    "membership_start": now,
+                    "membership_end": now + timedelta(days=30),
+                }
+                for i in range(members)
+            ],
+        )
+    engine.dispose()
+
+
+async def child() -> dict:
+    started = time.perf_counter()
+    from app.main import app
+
+    imported = time.perf_counter()
+
+    import httpx
+    from app.api.deps import get_current_admin_user
+
+    app.dependency_overrides[get_current_admin_user] = lambda: None
+    timings = {"import_ms": (imported - started) * 1000}
+    async with app.router.lifespan_context(app):
+        timings["startup_ms"] = (time.perf_counter() - imported) * 1000
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://b") as client:
+            for name in ("first_request_ms", "second_request_ms"):
+                request_started = time.perf_counter()
+                response = await client.get("/api/v1/members")
+                assert response.status_code == 200, response.text
+                timings[name] = (time.perf_counter() - request_started) * 1000
+    return timings
+
+
+def sample(variant: dict) -> dict:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+        env={**os.environ, **ENV, **variant},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["process_ms"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def main(args) -> None:
+    seed(args.members)
+    columns = [
+        "import_ms",
+        "startup_ms",
+        "first_request_ms",
+        "second_request_ms",
+        "process_ms",
+    ]
+    print(f"samples={args.samples} members={args.members} (medians)")
+    print(f"{'variant':<8}" + "".join(f"{column:>19}" for column in columns))
+    for name, variant in VARIANTS.items():
+        samples = [sample(variant) for _ in range(args.samples)]
+        print(
+            f"{name:<8}"
+            + "".join(
+                f"{statistics.median(s[column] for s in samples):>19.2f}"
+                for column in columns
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(asyncio.run(child())))
+    else:
+        main(args)